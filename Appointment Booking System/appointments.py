@@ -0,0 +1,284 @@
+import os
+from datetime import datetime, timedelta
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo.errors import DuplicateKeyError
+from database import appointment_collection, patient_collection, doctor_collection
+from availability import slot_start, utcnow, DEFAULT_SLOT_MINUTES
+
+
+PAGE_SIZE = 20
+WINDOWS = ("upcoming", "past")
+HOLD_SECONDS = int(os.getenv("SLOT_HOLD_SECONDS", "300"))
+
+
+def _window_filter(window: str):
+    now = utcnow()
+    return {"start_at": {"$lt": now}} if window == "past" else {"start_at": {"$gte": now}}
+
+
+def _sort(window: str):
+    # Upcoming: soonest first. Past: most recent first.
+    direction = -1 if window == "past" else 1
+    return [("start_at", direction), ("_id", direction)]
+
+
+def encode_cursor(appt) -> str:
+    return f"{appt['start_at'].isoformat()}~{appt['_id']}"
+
+
+def _keyset_filter(after: str, window: str):
+    """Filter for rows strictly after the cursor in ``window``'s sort order (None if malformed)."""
+    try:
+        raw_start, _, raw_id = after.partition("~")
+        start_at = datetime.fromisoformat(raw_start)
+        last_id = ObjectId(raw_id)
+    except (InvalidId, TypeError, ValueError):
+        return None
+    op = "$lt" if window == "past" else "$gt"
+    return {"$or": [{"start_at": {op: start_at}}, {"start_at": start_at, "_id": {op: last_id}}]}
+
+
+def _listing_match(owner: dict, window: str, after: str = None):
+    # Slot holds live in the same collection but aren't appointments yet
+    clauses = [owner, {"status": {"$ne": "held"}}, _window_filter(window)]
+    keyset = _keyset_filter(after, window) if after else None
+    if keyset:
+        clauses.append(keyset)
+    return {"$and": clauses}
+
+
+def _page(rows, limit):
+    """Trim the look-ahead row; return ``(rows, next_cursor)``."""
+    if len(rows) > limit:
+        return rows[:limit], encode_cursor(rows[limit - 1])
+    return rows, None
+
+
+async def patient_appointments(patient_id: ObjectId, window: str = "upcoming", after: str = None, limit: int = PAGE_SIZE):
+    """One page of a patient's appointments joined with doctor and clinic details in one aggregation.
+
+    Keyset-paginated on (start_at, _id); returns ``(appointments, next_cursor)``.
+    """
+    pipeline = [
+        {"$match": _listing_match({"patient_id": patient_id}, window, after)},
+        {"$sort": dict(_sort(window))},
+        {"$limit": limit + 1},
+        {"$lookup": {
+            "from": "Doctors",
+            "localField": "doctor_id",
+            "foreignField": "_id",
+            "pipeline": [{"$project": {"full_name": 1, "specialization": 1}}],
+            "as": "doctor"
+        }},
+        {"$lookup": {
+            "from": "Clinics",
+            "localField": "clinic_id",
+            "foreignField": "_id",
+            "pipeline": [{"$project": {"name": 1, "address": 1}}],
+            "as": "clinic"
+        }},
+        {"$set": {
+            "doctor_name": {"$ifNull": [{"$first": "$doctor.full_name"}, "Unknown"]},
+            "specialization": {"$ifNull": [{"$first": "$doctor.specialization"}, "N/A"]},
+            "clinic_name": {"$ifNull": [{"$first": "$clinic.name"}, "Unknown"]},
+            "clinic_address": {"$ifNull": [{"$first": "$clinic.address"}, "Unknown"]},
+        }},
+        {"$unset": ["doctor", "clinic"]},
+    ]
+    cursor = await appointment_collection.aggregate(pipeline)
+    return _page(await cursor.to_list(None), limit)
+
+
+async def doctor_appointments(doctor_id: ObjectId, window: str = "upcoming", after: str = None, limit: int = PAGE_SIZE):
+    """One page of a doctor's appointments, hydrated with patient details.
+
+    Keyset-paginated on (start_at, _id); returns ``(rows, next_cursor)``. Patients are
+    fetched with a single ``$in`` query projected to the fields the dashboard shows.
+    """
+    appointments = await appointment_collection.find(
+        _listing_match({"doctor_id": doctor_id}, window, after),
+        {"patient_id": 1, "date": 1, "slot": 1, "start_at": 1}
+    ).sort(_sort(window)).limit(limit + 1).to_list(None)
+    appointments, next_cursor = _page(appointments, limit)
+
+    patient_ids = list({appt["patient_id"] for appt in appointments})
+    patients = {
+        p["_id"]: p
+        async for p in patient_collection.find(
+            {"_id": {"$in": patient_ids}},
+            {"full_name": 1, "email": 1, "age": 1, "phone_number": 1}
+        )
+    }
+
+    rows = [
+        _doctor_row(appt, patients[appt["patient_id"]])
+        for appt in appointments if appt["patient_id"] in patients
+    ]
+    return rows, next_cursor
+
+
+def _doctor_row(appt, patient):
+    start_at = appt.get("start_at")
+    return {
+        "name": patient.get("full_name", "Unknown"),
+        "email": patient.get("email", "Unknown"),
+        "date": appt["date"],
+        "slot": appt["slot"],
+        "age": patient.get("age", "N/A"),
+        "phone": patient.get("phone_number", "N/A"),
+        "appointment_id": str(appt["_id"]),
+        "start_at": start_at.isoformat() if start_at else None
+    }
+
+
+async def doctor_row(appt):
+    """A single doctor-dashboard row for ``appt``; None if its patient no longer exists."""
+    patient = await patient_collection.find_one(
+        {"_id": appt["patient_id"]}, {"full_name": 1, "email": 1, "age": 1, "phone_number": 1}
+    )
+    return _doctor_row(appt, patient) if patient else None
+
+
+def appointment_times(date: str, slot: str, duration_minutes: int = DEFAULT_SLOT_MINUTES):
+    """Typed time fields stored alongside the display ``date``/``slot`` strings."""
+    return {"start_at": slot_start(date, slot), "duration_minutes": duration_minutes}
+
+
+async def book_slot(doctor_id: ObjectId, clinic_id: ObjectId, patient_id: ObjectId, date: str, slot: str,
+                    duration_minutes: int = DEFAULT_SLOT_MINUTES):
+    """Insert an appointment in a single write.
+
+    The unique (doctor_id, date, slot) index makes the insert itself the conflict
+    check, so concurrent requests can't double-book. A hold on the slot that has
+    expired (or is the patient's own) is converted instead. Returns the new
+    ``_id`` or None if the slot is already taken.
+    """
+    try:
+        result = await appointment_collection.insert_one({
+            "doctor_id": doctor_id,
+            "clinic_id": clinic_id,
+            "patient_id": patient_id,
+            "slot": slot,
+            "date": date,
+            "status": "booked",
+            **appointment_times(date, slot, duration_minutes)
+        })
+        booked_id = result.inserted_id
+    except DuplicateKeyError:
+        taken_over = await appointment_collection.find_one_and_update(
+            _claimable_hold(doctor_id, date, slot, patient_id),
+            {"$set": {"patient_id": patient_id, "clinic_id": clinic_id, "status": "booked"},
+             "$unset": {"hold_expires_at": ""}},
+            projection={"_id": 1}
+        )
+        if not taken_over:
+            return None
+        booked_id = taken_over["_id"]
+    await touch_schedule(doctor_id)
+    return booked_id
+
+
+def _claimable_hold(doctor_id, date, slot, patient_id):
+    # The TTL monitor may not have removed an expired hold yet; it still owns the index entry
+    return {"doctor_id": doctor_id, "date": date, "slot": slot, "status": "held",
+            "$or": [{"hold_expires_at": {"$lte": utcnow()}}, {"patient_id": patient_id}]}
+
+
+async def hold_slot(doctor_id: ObjectId, clinic_id: ObjectId, patient_id: ObjectId, date: str, slot: str,
+                    duration_minutes: int = DEFAULT_SLOT_MINUTES):
+    """Reserve a slot for ``HOLD_SECONDS`` while the patient finishes booking.
+
+    The hold is an ``Appointments`` document with ``status: "held"``, so the
+    unique slot index arbitrates holds and bookings alike, and the TTL index on
+    ``hold_expires_at`` deletes it if it's never confirmed. A patient holds at
+    most one slot per doctor. Returns ``(hold_id, expires_at)``, or None if the
+    slot is booked or held by someone else.
+    """
+    expires_at = utcnow() + timedelta(seconds=HOLD_SECONDS)
+    try:
+        result = await appointment_collection.insert_one({
+            "doctor_id": doctor_id,
+            "clinic_id": clinic_id,
+            "patient_id": patient_id,
+            "slot": slot,
+            "date": date,
+            "status": "held",
+            "hold_expires_at": expires_at,
+            **appointment_times(date, slot, duration_minutes)
+        })
+        hold_id = result.inserted_id
+    except DuplicateKeyError:
+        renewed = await appointment_collection.find_one_and_update(
+            _claimable_hold(doctor_id, date, slot, patient_id),
+            {"$set": {"patient_id": patient_id, "clinic_id": clinic_id, "hold_expires_at": expires_at}},
+            projection={"_id": 1}
+        )
+        if not renewed:
+            return None
+        hold_id = renewed["_id"]
+
+    await appointment_collection.delete_many(
+        {"doctor_id": doctor_id, "patient_id": patient_id, "status": "held", "_id": {"$ne": hold_id}}
+    )
+    await touch_schedule(doctor_id, holds_until=expires_at)
+    return hold_id, expires_at
+
+
+async def confirm_hold(hold_id: ObjectId, doctor_id: ObjectId, patient_id: ObjectId, date: str, slot: str) -> bool:
+    """Turn the patient's unexpired hold with ``doctor_id`` on ``date``/``slot`` into a booking with one update."""
+    result = await appointment_collection.update_one(
+        {"_id": hold_id, "doctor_id": doctor_id, "patient_id": patient_id, "date": date, "slot": slot,
+         "status": "held", "hold_expires_at": {"$gt": utcnow()}},
+        {"$set": {"status": "booked"}, "$unset": {"hold_expires_at": ""}}
+    )
+    return result.modified_count == 1
+
+
+async def reschedule_appointment(appointment_id: ObjectId, date: str, slot: str, match: dict = None,
+                                 duration_minutes: int = DEFAULT_SLOT_MINUTES) -> str:
+    """Move a booked appointment to ``date``/``slot`` in a single write.
+
+    ``find_one_and_update`` rewrites the slot fields in place and the unique
+    (doctor_id, date, slot) index rejects the write if the target is taken, so
+    there's never a moment with two copies of the appointment or none.
+    ``match`` narrows who may move it, e.g. ``{"patient_id": ...}``;
+    ``duration_minutes`` is the length of the new slot, as for ``book_slot``.
+    Returns ``"moved"``, ``"taken"`` or ``"not_found"``.
+    """
+    query = {"_id": appointment_id, "status": {"$ne": "held"}, **(match or {})}
+    update = {"$set": {"date": date, "slot": slot, "start_at": slot_start(date, slot),
+                       "duration_minutes": duration_minutes}}
+    for attempt in range(2):
+        try:
+            appt = await appointment_collection.find_one_and_update(query, update, projection={"doctor_id": 1})
+        except DuplicateKeyError:
+            if attempt:
+                return "taken"
+            # A stale hold on the target (expired, or this patient's own) doesn't count: clear it and retry once
+            current = await appointment_collection.find_one(query, {"doctor_id": 1, "patient_id": 1})
+            if not current:
+                return "not_found"
+            cleared = await appointment_collection.delete_one(
+                _claimable_hold(current["doctor_id"], date, slot, current["patient_id"])
+            )
+            if not cleared.deleted_count:
+                return "taken"
+            continue
+        if not appt:
+            return "not_found"
+        await touch_schedule(appt["doctor_id"])
+        return "moved"
+
+
+async def touch_schedule(doctor_id: ObjectId, holds_until: datetime = None):
+    """Bump the doctor's ``schedule_version``; call after any write to their appointments.
+
+    Availability ETags are derived from it, so clients polling an unchanged
+    schedule get a 304 without the appointments being read. Holds expire without
+    a write, so ``holds_until`` records when the last one lapses.
+    """
+    update = {"$inc": {"schedule_version": 1}}
+    if holds_until:
+        update["$max"] = {"holds_until": holds_until}
+    await doctor_collection.update_one({"_id": doctor_id}, update)
@@ -0,0 +1,109 @@
+import json
+import os
+import stat
+from mimetypes import guess_type
+import anyio
+from markupsafe import Markup, escape
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import StaticFiles
+from compression import accepted_encodings
+
+STATIC_DIR = "static"
+DIST_DIR = os.path.join(STATIC_DIR, "dist")
+MANIFEST_PATH = os.path.join(DIST_DIR, "manifest.json")
+# Precompressed siblings written by build_assets.py, in order of preference
+PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+# Image variants written by build_assets.py, best first; the original is always the last fallback
+IMAGE_FORMATS = (("avif", "image/avif"), ("webp", "image/webp"))
+
+_manifest = None
+
+
+def load_manifest():
+    """Read the manifest written by build_assets.py (empty if the build hasn't run)."""
+    global _manifest
+    try:
+        with open(MANIFEST_PATH) as f:
+            _manifest = json.load(f)
+    except (OSError, ValueError):
+        _manifest = {}
+    return _manifest
+
+
+def static_url(path: str, fmt: str = None) -> str:
+    """URL for a static asset, fingerprinted when a build manifest is present.
+
+    ``fmt`` ("webp"/"avif") picks an optimized image variant if one was built;
+    pages should prefer ``picture()``/``background_image()``, which keep the
+    original as a fallback for browsers without that format. Falls back to the plain ``/static/...`` URL so development works without a build.
+    """
+    manifest = _manifest if _manifest is not None else load_manifest()
+    rel = path.lstrip("./").removeprefix("static/")
+    entry = manifest.get(rel)
+    if not entry:
+        return f"/static/{rel}"
+    return f"/static/dist/{entry.get(fmt) or entry['file']}"
+
+
+def image_sources(path: str) -> list:
+    """``[(url, mime type)]`` for every version of an image: built variants best first, then the original."""
+    manifest = _manifest if _manifest is not None else load_manifest()
+    entry = manifest.get(path.lstrip("./").removeprefix("static/")) or {}
+    sources = [(f"/static/dist/{entry[fmt]}", mime) for fmt, mime in IMAGE_FORMATS if entry.get(fmt)]
+    return sources + [(static_url(path), guess_type(path)[0])]
+
+
+def picture(path: str, alt: str = "", **attrs) -> Markup:
+    """``<picture>`` offering the AVIF/WebP variants, with an ``<img>`` of the original as fallback.
+
+    Extra keyword arguments become ``<img>`` attributes (``class_`` for ``class``).
+    """
+    *variants, (original, _) = image_sources(path)
+    sources = "".join(f'<source type="{mime}" srcset="{url}">' for url, mime in variants)
+    extra = "".join(f' {name.rstrip("_")}="{escape(value)}"' for name, value in attrs.items())
+    return Markup(f'<picture>{sources}<img src="{original}" alt="{escape(alt)}"{extra}></picture>')
+
+
+def background_image(path: str, quote: str = '"') -> Markup:
+    """CSS declarations for a background image: the original everywhere, then an ``image-set()``.
+
+    Browsers that understand ``image-set()`` with ``type()`` pick the best format
+    they support; older ones drop that declaration and keep the original. Pass
+    ``quote="'"`` inside a double-quoted ``style`` attribute.
+    """
+    sources = image_sources(path)
+    original = sources[-1][0]
+    css = f"background-image: url({quote}{original}{quote});"
+    if len(sources) > 1:
+        options = ", ".join(f"url({quote}{url}{quote}) type({quote}{mime}{quote})" for url, mime in sources)
+        css += f" background-image: image-set({options});"
+    return Markup(css)
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """Serves content-hashed files; their URL changes with their content, so cache forever.
+
+    When the client accepts it, a precompressed ``.br``/``.gz`` sibling is sent
+    instead of compressing on every request.
+    """
+
+    async def get_response(self, path, scope):
+        accepted = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        media_type = guess_type(path)[0]
+        for encoding, suffix in PRECOMPRESSED:
+            if encoding not in accepted:
+                continue
+            full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path + suffix)
+            if stat_result and stat.S_ISREG(stat_result.st_mode):
+                response = FileResponse(full_path, stat_result=stat_result, media_type=media_type)
+                response.headers["Content-Encoding"] = encoding
+                response.headers["Vary"] = "Accept-Encoding"
+                response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+                return response
+        return await super().get_response(path, scope)
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
@@ -0,0 +1,136 @@
+"""Per-doctor slot availability.
+
+Slots are generated from a doctor's ``opening_hours``/``closing_hours`` and
+``slot_minutes`` and only the requested date range of appointments is read.
+Each day is a bitmap over the doctor's slot list: bit ``i`` set means
+``slots[i]`` is taken, either booked or under someone's unexpired hold.
+"""
+import os
+from datetime import date, datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+from database import appointment_collection
+
+# Used when a doctor has no (parseable) hours on file
+DEFAULT_SLOTS = [
+    "10:00 AM", "10:30 AM", "11:00 AM", "11:30 AM",
+    "12:00 PM", "12:30 PM", "2:00 PM", "2:30 PM"
+]
+DEFAULT_SLOT_MINUTES = int(os.getenv("DEFAULT_SLOT_MINUTES", "30"))
+BOOKING_WINDOW_DAYS = int(os.getenv("BOOKING_WINDOW_DAYS", "14"))
+MAX_RANGE_DAYS = 62
+# Appointment dates/slots are wall-clock times in the clinics' timezone
+_tz_name = os.getenv("APP_TIMEZONE", "UTC")
+APP_TIMEZONE = timezone.utc if _tz_name == "UTC" else ZoneInfo(_tz_name)
+
+_TIME_FORMATS = ("%I:%M %p", "%I:%M%p", "%I %p", "%I%p", "%H:%M", "%H:%M:%S")
+
+
+def parse_time(value):
+    if isinstance(value, datetime):
+        return value.time()
+    if isinstance(value, time):
+        return value
+    if isinstance(value, str):
+        text = value.strip().upper()
+        for fmt in _TIME_FORMATS:
+            try:
+                return datetime.strptime(text, fmt).time()
+            except ValueError:
+                continue
+    return None
+
+
+def format_slot(t: time) -> str:
+    """``time(14, 0)`` -> ``"2:00 PM"``, the format stored in ``Appointments.slot``."""
+    return t.strftime("%I:%M %p").lstrip("0")
+
+
+def local_today() -> date:
+    return datetime.now(APP_TIMEZONE).date()
+
+
+def utcnow() -> datetime:
+    """Naive UTC now, comparable with the naive UTC datetimes PyMongo returns."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def slot_start(day: str, slot: str):
+    """``("2025-01-31", "2:30 PM")`` -> naive UTC ``start_at``; None if either part doesn't parse."""
+    slot_time = parse_time(slot)
+    try:
+        local_day = datetime.strptime(day, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None
+    if slot_time is None:
+        return None
+    local = datetime.combine(local_day, slot_time, tzinfo=APP_TIMEZONE)
+    return local.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def slot_minutes(doctor) -> int:
+    return int(doctor.get("slot_minutes") or DEFAULT_SLOT_MINUTES)
+
+
+def doctor_slots(doctor) -> list:
+    """Slot labels for a doctor's working day, in order."""
+    opening = parse_time(doctor.get("opening_hours"))
+    closing = parse_time(doctor.get("closing_hours"))
+    minutes = slot_minutes(doctor)
+    if not opening or not closing or opening >= closing or minutes <= 0:
+        return list(DEFAULT_SLOTS)
+
+    day = date.min
+    current = datetime.combine(day, opening)
+    end = datetime.combine(day, closing)
+    step = timedelta(minutes=minutes)
+    slots = []
+    while current + step <= end:
+        slots.append(format_slot(current.time()))
+        current += step
+    return slots or list(DEFAULT_SLOTS)
+
+
+def date_range(from_date: date, to_date: date):
+    to_date = min(to_date, from_date + timedelta(days=MAX_RANGE_DAYS - 1))
+    return [from_date + timedelta(days=i) for i in range((to_date - from_date).days + 1)]
+
+
+def occupying_filter(holder=None):
+    """Appointments that occupy their slot: bookings, and holds that haven't expired.
+
+    The TTL monitor only deletes expired holds about once a minute, so expiry is
+    checked here too. ``holder``'s own holds don't count against them.
+    """
+    live_hold = {"hold_expires_at": {"$gt": utcnow()}}
+    if holder:
+        live_hold["patient_id"] = {"$ne": holder}
+    return {"$or": [{"hold_expires_at": {"$exists": False}}, live_hold]}
+
+
+async def get_availability(doctor, from_date: date, to_date: date, exclude_id=None, holder=None):
+    """``{"slots": [...], "days": {"YYYY-MM-DD": bitmap}}`` for ``from_date``..``to_date`` inclusive.
+
+    Ranges are capped at ``MAX_RANGE_DAYS``. ``exclude_id`` ignores one appointment,
+    e.g. the one being rescheduled; ``holder`` is the patient looking, whose own
+    holds show as free.
+    """
+    slots = doctor_slots(doctor)
+    index = {slot: i for i, slot in enumerate(slots)}
+    days = {d.isoformat(): 0 for d in date_range(from_date, to_date)}
+    if not days:
+        return {"slots": slots, "days": days}
+
+    query = {"doctor_id": doctor["_id"], "date": {"$gte": min(days), "$lte": max(days)}, **occupying_filter(holder)}
+    if exclude_id:
+        query["_id"] = {"$ne": exclude_id}
+
+    async for appt in appointment_collection.find(query, {"_id": 0, "date": 1, "slot": 1}):
+        i = index.get(appt["slot"])
+        if i is not None and appt["date"] in days:
+            days[appt["date"]] |= 1 << i
+    return {"slots": slots, "days": days}
+
+
+def free_slots(availability, day: str) -> list:
+    bitmap = availability["days"].get(day, 0)
+    return [slot for i, slot in enumerate(availability["slots"]) if not bitmap >> i & 1]
@@ -0,0 +1,20 @@
+"""Import first in any benchmark that writes through the app's own modules.
+
+Points ``database`` at a dedicated bench database (the same one
+``db_concurrency.py`` uses) and refuses to run if it would still be the app's
+database - these scripts insert and delete documents in bulk, and running
+workers would pick them up through search and the change feed.
+"""
+import os
+import sys
+
+BENCH_DB_NAME = "ApoointmentBookingBench"
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+# Set before database.py runs load_dotenv(), which never overrides an existing variable
+os.environ["MONGO_DB_NAME"] = BENCH_DB_NAME
+
+import database  # noqa: E402
+
+if database.db.name == database.APP_DB_NAME:
+    sys.exit(f"Refusing to run against the app database {database.APP_DB_NAME!r}")
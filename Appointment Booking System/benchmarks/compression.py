@@ -0,0 +1,47 @@
+"""Bytes on the wire and CPU per request for identity, gzip and brotli.
+
+Compresses the HTML templates and CSS files the way CompressionMiddleware
+does per request, and the way build_assets.py precompresses static files once.
+
+    python benchmarks/compression.py
+"""
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from compression import GZIP_LEVEL, BROTLI_QUALITY, brotli, compress  # noqa: E402
+
+ROUNDS = 50
+PAYLOADS = ["templates/cardio.html", "templates/index.html", "static/css/psychiatry.css", "static/css/styles.css"]
+
+
+def measure(data, encoding, **levels):
+    start = time.process_time()
+    for _ in range(ROUNDS):
+        out = compress(data, encoding, **levels)
+    return len(out), (time.process_time() - start) * 1000 / ROUNDS
+
+
+def main():
+    os.chdir(os.path.join(os.path.dirname(__file__), ".."))
+    modes = [("gzip", "gzip", {"gzip_level": GZIP_LEVEL}), ("gzip-9 (static)", "gzip", {"gzip_level": 9})]
+    if brotli is not None:
+        modes += [("br", "br", {"brotli_quality": BROTLI_QUALITY}), ("br-11 (static)", "br", {"brotli_quality": 11})]
+    else:
+        print("brotli not installed - gzip only\n")
+
+    print(f"{'payload':32s} {'mode':16s} {'bytes':>9s} {'ratio':>7s} {'cpu ms/req':>11s}")
+    for path in PAYLOADS + sorted(set(glob.glob("static/css/*.css")) - set(PAYLOADS)):
+        with open(path, "rb") as f:
+            data = f.read()
+        print(f"{path:32s} {'identity':16s} {len(data):9,d} {'1.00':>7s} {0:11.3f}")
+        for label, encoding, levels in modes:
+            size, cpu_ms = measure(data, encoding, **levels)
+            print(f"{'':32s} {label:16s} {size:9,d} {size / len(data):7.2f} {cpu_ms:11.3f}")
+
+
+if __name__ == "__main__":
+    main()
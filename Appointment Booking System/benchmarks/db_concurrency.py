@@ -0,0 +1,71 @@
+"""Concurrent throughput of blocking vs async Mongo calls inside async handlers.
+
+Simulates N in-flight requests on one event loop, each doing the same
+``Doctors.find_one`` a route would do, first with the old synchronous
+``MongoClient`` and then with the async client from ``database.py``.
+
+Run against a local mongod:
+    MONGO_URI=mongodb://localhost:27017 python benchmarks/db_concurrency.py --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from pymongo import AsyncMongoClient, MongoClient
+
+DB_NAME = "ApoointmentBookingBench"
+
+
+async def run(handler, total, concurrency):
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with sem:
+            await handler(i)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--slow-ms", type=int, default=0,
+                        help="add server-side latency to each query via $where sleep()")
+    args = parser.parse_args()
+
+    uri = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+    sync_db = MongoClient(uri)[DB_NAME]
+    async_client = AsyncMongoClient(uri)
+    async_db = async_client[DB_NAME]
+
+    sync_db["Doctors"].drop()
+    sync_db["Doctors"].insert_many([{"email": f"doc{i}@example.com", "status": "approved"} for i in range(1000)])
+    sync_db["Doctors"].create_index("email")
+
+    def query(i):
+        q = {"email": f"doc{i % 1000}@example.com"}
+        if args.slow_ms:
+            q["$where"] = f"sleep({args.slow_ms}) || true"
+        return q
+
+    async def blocking_handler(i):
+        sync_db["Doctors"].find_one(query(i))
+
+    async def async_handler(i):
+        await async_db["Doctors"].find_one(query(i))
+
+    for name, handler in (("blocking MongoClient", blocking_handler), ("AsyncMongoClient", async_handler)):
+        elapsed = await run(handler, args.requests, args.concurrency)
+        print(f"{name:22s} {args.requests} requests @ {args.concurrency} concurrent: "
+              f"{elapsed:.2f}s  ({args.requests / elapsed:,.0f} req/s)")
+
+    sync_db["Doctors"].drop()
+    await async_client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
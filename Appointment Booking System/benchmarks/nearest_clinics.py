@@ -0,0 +1,79 @@
+"""Latency of the "doctors near me" specialty listing at tens of thousands of clinics.
+
+Seeds synthetic clinics scattered over a metro area (plus a few doctors each),
+then times ``nearest_doctors`` from random points in it - one ``$geoNear`` +
+``$lookup`` aggregation per page. The seeded documents are removed afterwards.
+
+    MONGO_URI=mongodb://localhost:27017 python benchmarks/nearest_clinics.py --clinics 50000 --queries 500
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from bson import ObjectId
+
+import bench_db  # noqa: F401  - selects the bench database; must precede app imports
+
+from database import clinic_collection, doctor_collection  # noqa: E402
+from geo import nearest_doctors, point  # noqa: E402
+from indexes import ensure_indexes  # noqa: E402
+
+CENTER = (12.97, 77.59)   # lat, lng
+SPREAD = 0.5              # degrees, ~55 km either way
+SPECIALIZATIONS = ["Cardiology", "Dental", "Gynaecology", "Neurology", "Pediatrics"]
+MARKER = "nearest_clinics_benchmark"
+
+
+def random_point(rng):
+    return CENTER[0] + rng.uniform(-SPREAD, SPREAD), CENTER[1] + rng.uniform(-SPREAD, SPREAD)
+
+
+async def seed(clinics, rng):
+    clinic_docs, doctor_docs = [], []
+    for i in range(clinics):
+        clinic_id = ObjectId()
+        clinic_docs.append({"_id": clinic_id, "name": f"Clinic {i}", "address": f"{i} Benchmark Road",
+                            "location": point(*random_point(rng)), "seed": MARKER})
+        for specialization in rng.sample(SPECIALIZATIONS, 2):
+            doctor_docs.append({"full_name": f"Dr. Bench {i}", "specialization": specialization,
+                                "clinic_id": clinic_id, "status": "approved", "seed": MARKER})
+    for docs, coll in ((clinic_docs, clinic_collection), (doctor_docs, doctor_collection)):
+        for i in range(0, len(docs), 5000):
+            await coll.insert_many(docs[i:i + 5000], ordered=False)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clinics", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--radius-km", type=float, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    await ensure_indexes()
+    try:
+        start = time.perf_counter()
+        await seed(args.clinics, rng)
+        print(f"seeded {args.clinics} clinics in {time.perf_counter() - start:.1f}s")
+
+        latencies, rows = [], 0
+        for _ in range(args.queries):
+            lat, lng = random_point(rng)
+            start = time.perf_counter()
+            result = await nearest_doctors(rng.choice(SPECIALIZATIONS), lat, lng, args.radius_km)
+            latencies.append(time.perf_counter() - start)
+            rows += len(result)
+    finally:
+        await doctor_collection.delete_many({"seed": MARKER})
+        await clinic_collection.delete_many({"seed": MARKER})
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{args.queries} listings ({rows / args.queries:.0f} doctors each): "
+          f"p50 {statistics.median(latencies) * 1000:.1f} ms, p99 {p99 * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
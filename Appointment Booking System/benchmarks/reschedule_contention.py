@@ -0,0 +1,85 @@
+"""Stress test: concurrent reschedules must never duplicate or lose an appointment.
+
+Two scenarios against one doctor/day:
+
+* many appointments rescheduled onto the same free slot at once - exactly one
+  moves, the rest stay where they were;
+* one appointment rescheduled to many different slots at once - it ends up in
+  exactly one of them.
+
+    MONGO_URI=mongodb://localhost:27017 python benchmarks/reschedule_contention.py --appointments 200
+"""
+import argparse
+import asyncio
+import sys
+import time
+from datetime import time as dt_time
+
+from bson import ObjectId
+
+import bench_db  # noqa: F401  - selects the bench database; must precede app imports
+
+from appointments import book_slot, reschedule_appointment  # noqa: E402
+from availability import format_slot  # noqa: E402
+from database import appointment_collection  # noqa: E402
+from indexes import ensure_indexes  # noqa: E402
+
+DATE = "2099-01-01"
+
+
+def slots(n):
+    """``n`` distinct slot labels, one per minute from 00:00."""
+    return [format_slot(dt_time(i // 60, i % 60)) for i in range(n)]
+
+
+async def same_target(doctor_id, count):
+    labels = slots(count + 1)
+    target = labels[-1]
+    ids = [await book_slot(doctor_id, None, ObjectId(), DATE, label) for label in labels[:-1]]
+
+    start = time.perf_counter()
+    outcomes = await asyncio.gather(*(reschedule_appointment(i, DATE, target) for i in ids))
+    elapsed = time.perf_counter() - start
+
+    stored = await appointment_collection.count_documents({"doctor_id": doctor_id})
+    on_target = await appointment_collection.count_documents({"doctor_id": doctor_id, "slot": target})
+    print(f"{count} appointments -> one slot in {elapsed:.2f}s: {outcomes.count('moved')} moved, "
+          f"{outcomes.count('taken')} taken; {stored} stored, {on_target} on target")
+    return outcomes.count("moved") == 1 and stored == count and on_target == 1
+
+
+async def many_targets(doctor_id, count):
+    labels = slots(count + 1)
+    appt_id = await book_slot(doctor_id, None, ObjectId(), DATE, labels[0])
+
+    start = time.perf_counter()
+    outcomes = await asyncio.gather(*(reschedule_appointment(appt_id, DATE, label) for label in labels[1:]))
+    elapsed = time.perf_counter() - start
+
+    stored = await appointment_collection.count_documents({"doctor_id": doctor_id})
+    print(f"one appointment -> {count} slots in {elapsed:.2f}s: {outcomes.count('moved')} moves applied; "
+          f"{stored} stored")
+    return stored == 1
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--appointments", type=int, default=200)
+    args = parser.parse_args()
+
+    await ensure_indexes()
+    ok = True
+    for scenario in (same_target, many_targets):
+        doctor_id = ObjectId()
+        try:
+            ok = await scenario(doctor_id, args.appointments) and ok
+        finally:
+            await appointment_collection.delete_many({"doctor_id": doctor_id})
+
+    if not ok:
+        sys.exit("FAIL: an appointment was duplicated or lost")
+    print("OK")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
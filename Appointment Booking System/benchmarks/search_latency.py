@@ -0,0 +1,97 @@
+"""Typeahead latency of the in-memory doctor search index.
+
+Builds the index from synthetic doctors (no database needed), then times a
+mix of typeahead queries: growing prefixes, multi-word queries, clinic/address
+words and typos. The target is p99 under 20 ms at 100k doctors.
+
+    python benchmarks/search_latency.py --doctors 100000 --queries 5000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+from bson import ObjectId
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from search import DoctorSearch  # noqa: E402
+
+FIRST = ["Aarav", "Aditi", "Arjun", "Ananya", "Ishaan", "Kavya", "Rohan", "Priya", "Vikram", "Sneha",
+         "Rahul", "Meera", "Karan", "Divya", "Nikhil", "Pooja", "Sanjay", "Neha", "Amit", "Riya"]
+LAST = ["Sharma", "Verma", "Iyer", "Reddy", "Nair", "Patel", "Gupta", "Mehta", "Joshi", "Kapoor",
+        "Singh", "Das", "Bose", "Menon", "Rao", "Kulkarni", "Chopra", "Malhotra", "Pillai", "Banerjee"]
+SPECIALIZATIONS = ["Cardiology", "Dental", "Gynaecology", "Neurology", "Pediatrics", "Psychiatry", "Orthopedics"]
+CITIES = ["Mumbai", "Delhi", "Bengaluru", "Chennai", "Hyderabad", "Pune", "Kolkata", "Jaipur", "Lucknow", "Kochi"]
+STREETS = ["MG Road", "Park Street", "Ring Road", "Station Road", "Lake View", "Hill Road", "Church Street"]
+
+
+def build(n, clinics):
+    rng = random.Random(7)
+    clinic_docs = [
+        {"_id": ObjectId(), "name": f"{rng.choice(LAST)} {rng.choice(['Care', 'Health', 'Clinic', 'Hospital'])} {i}",
+         "address": f"{rng.randint(1, 999)} {rng.choice(STREETS)}, {rng.choice(CITIES)}"}
+        for i in range(clinics)
+    ]
+    index = DoctorSearch()
+    start = time.perf_counter()
+    for i in range(n):
+        clinic = rng.choice(clinic_docs)
+        index.add({
+            "_id": ObjectId(),
+            "full_name": f"Dr. {rng.choice(FIRST)} {rng.choice(LAST)}{'' if i % 3 else ' ' + rng.choice(LAST)}",
+            "specialization": rng.choice(SPECIALIZATIONS),
+            "clinic_id": clinic["_id"],
+        }, clinic)
+    index.finish_build()  # the one-time sort load() runs in a thread before swapping the index in
+    return index, time.perf_counter() - start
+
+
+def queries(count):
+    rng = random.Random(11)
+    out = []
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.4:                      # typing a name
+            name = rng.choice(FIRST)
+            out.append(name[:rng.randint(1, len(name))])
+        elif kind < 0.6:                    # name + specialization
+            out.append(f"{rng.choice(LAST)} {rng.choice(SPECIALIZATIONS)[:rng.randint(2, 5)]}")
+        elif kind < 0.8:                    # place
+            out.append(f"{rng.choice(SPECIALIZATIONS)[:4]} {rng.choice(CITIES)[:rng.randint(2, 6)]}")
+        else:                               # typo
+            word = rng.choice(LAST + SPECIALIZATIONS)
+            i = rng.randrange(1, len(word))
+            out.append(word[:i] + word[i + 1:])
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--doctors", type=int, default=100_000)
+    parser.add_argument("--clinics", type=int, default=5_000)
+    parser.add_argument("--queries", type=int, default=5_000)
+    args = parser.parse_args()
+
+    index, build_seconds = build(args.doctors, args.clinics)
+    print(f"indexed {args.doctors} doctors ({index.stats()['tokens']} tokens) in {build_seconds:.2f}s")
+
+    latencies, empty = [], 0
+    for q in queries(args.queries):
+        start = time.perf_counter()
+        results = index.search(q)
+        latencies.append(time.perf_counter() - start)
+        empty += not results
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{args.queries} queries: p50 {statistics.median(latencies) * 1000:.2f} ms, "
+          f"p99 {p99 * 1000:.2f} ms, max {latencies[-1] * 1000:.2f} ms, {empty} with no results")
+    if p99 > 0.020:
+        sys.exit("FAIL: p99 above 20 ms")
+
+
+if __name__ == "__main__":
+    main()
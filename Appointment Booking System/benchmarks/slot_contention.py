@@ -0,0 +1,49 @@
+"""Stress test: hundreds of simultaneous bookings for one doctor/date/slot.
+
+Exactly one booking must win; every other request must come back as
+"slot taken" (the 409 path in submit_booking).
+
+    MONGO_URI=mongodb://localhost:27017 python benchmarks/slot_contention.py --bookings 500
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+from bson import ObjectId
+
+import bench_db  # noqa: F401  - selects the bench database; must precede app imports
+
+from appointments import book_slot  # noqa: E402
+from database import appointment_collection  # noqa: E402
+from indexes import ensure_indexes  # noqa: E402
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bookings", type=int, default=500)
+    args = parser.parse_args()
+
+    await ensure_indexes()
+    doctor_id, clinic_id = ObjectId(), ObjectId()
+    date, slot = "2099-01-01", "10:00 AM"
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(
+        book_slot(doctor_id, clinic_id, ObjectId(), date, slot) for _ in range(args.bookings)
+    ))
+    elapsed = time.perf_counter() - start
+
+    won = [r for r in results if r is not None]
+    stored = await appointment_collection.count_documents({"doctor_id": doctor_id})
+    print(f"{args.bookings} concurrent bookings in {elapsed:.2f}s: "
+          f"{len(won)} succeeded, {args.bookings - len(won)} rejected, {stored} stored")
+
+    await appointment_collection.delete_many({"doctor_id": doctor_id})
+    if len(won) != 1 or stored != 1:
+        sys.exit("FAIL: slot was double-booked")
+    print("OK")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,89 @@
+"""Failed submits under contention: booking directly vs holding the slot first.
+
+Simulates patients opening one doctor's booking page for the same day. Each
+one reads availability, picks a random free slot, "thinks" for a while and
+submits. Without holds, anyone whose slot was taken during the think time gets
+the 409 page and starts over. With holds, the slot is reserved the moment it's
+picked, so the conflict surfaces immediately (and cheaply) and the submit
+itself succeeds.
+
+    MONGO_URI=mongodb://localhost:27017 python benchmarks/slot_holds.py --patients 200 --think-ms 500
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import date, timedelta
+
+from bson import ObjectId
+
+import bench_db  # noqa: F401  - selects the bench database; must precede app imports
+
+from appointments import book_slot, hold_slot, confirm_hold  # noqa: E402
+from availability import get_availability, free_slots  # noqa: E402
+from database import appointment_collection, doctor_collection  # noqa: E402
+from indexes import ensure_indexes  # noqa: E402
+
+
+async def patient(doctor, day, use_holds, think_ms, stats):
+    patient_id = ObjectId()
+    while True:
+        availability = await get_availability(doctor, day, day, holder=patient_id)
+        free = free_slots(availability, day.isoformat())
+        if not free:
+            stats["gave_up"] += 1
+            return
+        slot = random.choice(free)
+
+        if use_holds:
+            hold = await hold_slot(doctor["_id"], None, patient_id, day.isoformat(), slot)
+            if not hold:
+                stats["hold_conflicts"] += 1
+                continue
+        await asyncio.sleep(random.uniform(0, think_ms) / 1000)
+
+        if use_holds:
+            ok = await confirm_hold(hold[0], doctor["_id"], patient_id, day.isoformat(), slot)
+        else:
+            ok = await book_slot(doctor["_id"], None, patient_id, day.isoformat(), slot) is not None
+        if ok:
+            stats["booked"] += 1
+            return
+        stats["failed_submits"] += 1
+
+
+async def run(use_holds, args):
+    doctor_id = ObjectId()
+    await doctor_collection.insert_one({"_id": doctor_id, "opening_hours": "9:00 AM",
+                                        "closing_hours": "5:00 PM", "slot_minutes": 15})
+    doctor = await doctor_collection.find_one({"_id": doctor_id})
+    day = date(2099, 1, 1) + timedelta(days=random.randrange(1000))
+    stats = dict.fromkeys(["booked", "failed_submits", "hold_conflicts", "gave_up"], 0)
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(*(patient(doctor, day, use_holds, args.think_ms, stats) for _ in range(args.patients)))
+        elapsed = time.perf_counter() - start
+    finally:
+        await appointment_collection.delete_many({"doctor_id": doctor_id})
+        await doctor_collection.delete_one({"_id": doctor_id})
+
+    label = "with holds" if use_holds else "direct    "
+    print(f"{label}: {stats['booked']} booked, {stats['failed_submits']} failed submits, "
+          f"{stats['hold_conflicts']} hold conflicts, {stats['gave_up']} found the day full  ({elapsed:.2f}s)")
+    return stats
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--patients", type=int, default=200)
+    parser.add_argument("--think-ms", type=float, default=500, help="max time between picking a slot and submitting")
+    args = parser.parse_args()
+
+    await ensure_indexes()
+    direct = await run(False, args)
+    held = await run(True, args)
+    print(f"failed submits: {direct['failed_submits']} -> {held['failed_submits']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
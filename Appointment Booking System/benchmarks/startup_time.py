@@ -0,0 +1,67 @@
+"""Cold-start timing: process launch -> first successful request -> ready.
+
+Starts ``uvicorn main:app`` in a subprocess and polls /healthz (time to first
+request) and /readyz (time until the database answered).
+
+    MONGO_URI=mongodb://localhost:27017 python benchmarks/startup_time.py --runs 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def wait_for(url, deadline):
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return time.perf_counter()
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.01)
+    raise TimeoutError(url)
+
+
+def one_run(port, timeout):
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=APP_DIR,
+    )
+    try:
+        deadline = start + timeout
+        first_request = wait_for(f"http://127.0.0.1:{port}/healthz", deadline) - start
+        ready = wait_for(f"http://127.0.0.1:{port}/readyz", deadline) - start
+        return first_request, ready
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=30)
+    args = parser.parse_args()
+
+    firsts, readies = [], []
+    for i in range(args.runs):
+        first, ready = one_run(args.port, args.timeout)
+        firsts.append(first)
+        readies.append(ready)
+        print(f"run {i + 1}: first request {first * 1000:.0f} ms, ready {ready * 1000:.0f} ms")
+
+    print(f"median time-to-first-request {statistics.median(firsts) * 1000:.0f} ms, "
+          f"time-to-ready {statistics.median(readies) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
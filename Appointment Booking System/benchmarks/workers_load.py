@@ -0,0 +1,101 @@
+"""Throughput with 1 worker vs N workers under the gunicorn config.
+
+Starts ``gunicorn main:app -c gunicorn_conf.py`` with each worker count, waits
+for /readyz, then drives the given paths with concurrent keep-alive clients for
+a fixed duration and reports requests/s and latency percentiles.
+
+    MONGO_URI=mongodb://localhost:27017 python benchmarks/workers_load.py --workers 1 4 \\
+        --path /AboutUs --path /api/doctors/<doctor_id>/availability
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+import httpx
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+async def wait_ready(base_url, timeout):
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.perf_counter() < deadline:
+            try:
+                if (await client.get("/readyz")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+    raise TimeoutError(f"{base_url} never became ready")
+
+
+async def drive(base_url, paths, concurrency, duration):
+    latencies, errors = [], 0
+    stop_at = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async def client_loop(client, offset):
+        nonlocal errors
+        i = offset
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            try:
+                response = await client.get(paths[i % len(paths)])
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+            i += 1
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client, n) for n in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return latencies, errors, elapsed
+
+
+def run(workers, args):
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), PORT=str(args.port))
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "main:app", "-c", "gunicorn_conf.py", "--access-logfile", "/dev/null"],
+        cwd=APP_DIR, env=env,
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        asyncio.run(wait_ready(base_url, args.timeout))
+        latencies, errors, elapsed = asyncio.run(drive(base_url, args.path, args.concurrency, args.duration))
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1] if latencies else 0
+    rps = len(latencies) / elapsed
+    print(f"{workers:>3} worker(s): {rps:8.0f} req/s  p50 {statistics.median(latencies) * 1000:6.1f} ms  "
+          f"p99 {p99 * 1000:6.1f} ms  errors {errors}")
+    return rps
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--path", action="append", help="path to request (repeatable); default /AboutUs")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+    args.path = args.path or ["/AboutUs"]
+
+    results = {workers: run(workers, args) for workers in args.workers}
+    baseline = results[args.workers[0]]
+    for workers, rps in results.items():
+        print(f"{workers:>3} worker(s): {rps / baseline:.2f}x of {args.workers[0]}-worker throughput")
+
+
+if __name__ == "__main__":
+    main()
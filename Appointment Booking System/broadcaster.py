@@ -0,0 +1,94 @@
+"""In-process pub/sub feeding Server-Sent Events.
+
+Each worker has one ``broadcaster``. ``change_feed`` publishes events to
+topics (e.g. ``("doctor", doctor_id)``) and every open SSE connection
+subscribed to that topic gets its own bounded queue. A subscriber that falls
+too far behind has its backlog replaced with a single ``resync`` event, which
+tells the page to reload instead of slowing everyone else down.
+"""
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+from fastapi.responses import StreamingResponse
+
+QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", "100"))
+HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+
+
+class Broadcaster:
+    def __init__(self, queue_size: int = QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers = {}   # topic -> set of queues
+        self.published = 0
+        self.dropped = 0
+
+    @asynccontextmanager
+    async def subscription(self, topic):
+        queue = asyncio.Queue(self.queue_size)
+        self._subscribers.setdefault(topic, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            queues = self._subscribers.get(topic)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[topic]
+
+    def has_subscribers(self, topic) -> bool:
+        return topic in self._subscribers
+
+    def topics(self, kind=None):
+        return [t for t in self._subscribers if kind is None or t[0] == kind]
+
+    def publish(self, topic, event: dict):
+        for queue in self._subscribers.get(topic, ()):
+            self.published += 1
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self.dropped += queue.qsize()
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"type": "resync"})
+
+    def publish_all(self, kind, event: dict):
+        """Publish to every topic of one kind, e.g. when the owner of an event is unknown."""
+        for topic in self.topics(kind):
+            self.publish(topic, event)
+
+    def stats(self):
+        return {
+            "topics": len(self._subscribers),
+            "subscribers": sum(len(q) for q in self._subscribers.values()),
+            "published": self.published,
+            "dropped": self.dropped,
+        }
+
+
+broadcaster = Broadcaster()
+
+
+def format_event(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+async def _stream(topic):
+    async with broadcaster.subscription(topic) as queue:
+        yield "retry: 5000\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"  # keeps proxies from closing an idle connection
+                continue
+            yield format_event(event)
+
+
+def sse_response(topic) -> StreamingResponse:
+    return StreamingResponse(
+        _stream(topic),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
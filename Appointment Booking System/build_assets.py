@@ -0,0 +1,159 @@
+"""Static asset build step.
+
+Copies everything under ``static/`` into ``static/dist/`` with content-hashed
+filenames, writes resized/recompressed WebP and AVIF variants of each image,
+rewrites image ``url()`` references inside CSS, and records it all in
+``static/dist/manifest.json`` for ``assets.static_url()``. Text assets also
+get ``.gz``/``.br`` siblings so they are never compressed per request.
+
+    python build_assets.py
+
+Image variants need Pillow; without it files are only fingerprinted.
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+from io import BytesIO
+from mimetypes import guess_type
+
+try:
+    from PIL import Image
+except ImportError:  # fingerprint-only build
+    Image = None
+
+from assets import STATIC_DIR, DIST_DIR, MANIFEST_PATH, IMAGE_FORMATS
+from compression import brotli, compress
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png"}
+TEXT_EXTS = {".css", ".js", ".json", ".svg", ".html", ".txt"}
+MAX_WIDTH = int(os.getenv("ASSET_MAX_WIDTH", "1920"))
+VARIANTS = {
+    # format -> Pillow save options
+    "webp": {"format": "WEBP", "quality": 80, "method": 6},
+    "avif": {"format": "AVIF", "quality": 55},
+}
+CSS_URL_RE = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+CSS_BACKGROUND_RE = re.compile(r"""background-image\s*:\s*url\(\s*(['"]?)([^'")]+)\1\s*\)\s*(?=[;}])""")
+
+
+def _hashed_name(rel_path, data, ext=None):
+    root, orig_ext = os.path.splitext(rel_path)
+    digest = hashlib.sha256(data).hexdigest()[:10]
+    return f"{root}.{digest}{ext or orig_ext}".replace(os.sep, "/")
+
+
+def _write(rel_path, data):
+    target = os.path.join(DIST_DIR, rel_path)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target, "wb") as f:
+        f.write(data)
+
+
+def _image_variants(data):
+    """Yield ``(fmt, bytes)`` for each variant Pillow can encode."""
+    if Image is None:
+        return
+    with Image.open(BytesIO(data)) as img:
+        img.load()
+        if img.width > MAX_WIDTH:
+            img = img.resize((MAX_WIDTH, round(img.height * MAX_WIDTH / img.width)), Image.LANCZOS)
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+        for fmt, options in VARIANTS.items():
+            out = BytesIO()
+            try:
+                img.save(out, **options)
+            except (KeyError, OSError, ValueError):
+                continue  # this Pillow build has no encoder for fmt
+            yield fmt, out.getvalue()
+
+
+def _rewrite_css(css, css_rel_path, manifest):
+    """Point ``url()``s at hashed files; a ``background-image`` also gets an AVIF/WebP ``image-set()``.
+
+    The plain declaration stays first, so browsers without ``image-set()`` or
+    those formats keep the original image.
+    """
+    css_dir = os.path.dirname(css_rel_path)
+
+    def entry_for(url):
+        if url.startswith(("http:", "https:", "data:", "//")):
+            return None
+        if url.startswith("/static/"):
+            rel = url[len("/static/"):]
+        else:
+            rel = os.path.normpath(os.path.join(css_dir, url)).replace(os.sep, "/")
+        return manifest.get(rel)
+
+    def background(match):
+        entry = entry_for(match.group(2))
+        if not entry:
+            return match.group(0)
+        original = f'url("/static/dist/{entry["file"]}")'
+        options = [f'url("/static/dist/{entry[fmt]}") type("{mime}")' for fmt, mime in IMAGE_FORMATS if entry.get(fmt)]
+        if not options:
+            return f"background-image: {original}"
+        options.append(f'{original} type("{guess_type(entry["file"])[0]}")')
+        return f"background-image: {original}; background-image: image-set({', '.join(options)})"
+
+    def replace(match):
+        entry = entry_for(match.group(2))
+        return f'url("/static/dist/{entry["file"]}")' if entry else match.group(0)
+
+    # The second pass leaves the /static/dist/ URLs written by the first alone (they aren't in the manifest)
+    return CSS_URL_RE.sub(replace, CSS_BACKGROUND_RE.sub(background, css))
+
+
+def build():
+    if os.path.isdir(DIST_DIR):
+        shutil.rmtree(DIST_DIR)
+
+    files = []
+    for root, dirs, names in os.walk(STATIC_DIR):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != DIST_DIR]
+        for name in names:
+            files.append(os.path.relpath(os.path.join(root, name), STATIC_DIR).replace(os.sep, "/"))
+    # CSS last so its url() rewrites can point at already-hashed images
+    files.sort(key=lambda rel: (rel.endswith(".css"), rel))
+
+    manifest = {}
+    original_bytes = optimized_bytes = 0
+    for rel in files:
+        with open(os.path.join(STATIC_DIR, rel), "rb") as f:
+            data = f.read()
+        ext = os.path.splitext(rel)[1].lower()
+
+        if ext == ".css":
+            data = _rewrite_css(data.decode("utf-8"), rel, manifest).encode("utf-8")
+
+        entry = {"file": _hashed_name(rel, data)}
+        _write(entry["file"], data)
+        if ext in TEXT_EXTS:
+            _write(entry["file"] + ".gz", compress(data, "gzip", gzip_level=9))
+            if brotli is not None:
+                _write(entry["file"] + ".br", compress(data, "br", brotli_quality=11))
+
+        smallest = len(data)
+        if ext in IMAGE_EXTS:
+            for fmt, variant in _image_variants(data):
+                if len(variant) < len(data):
+                    entry[fmt] = _hashed_name(rel, variant, "." + fmt)
+                    _write(entry[fmt], variant)
+                    smallest = min(smallest, len(variant))
+            original_bytes += len(data)
+            optimized_bytes += smallest
+        manifest[rel] = entry
+
+    with open(MANIFEST_PATH, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    print(f"{len(manifest)} assets written to {DIST_DIR}")
+    if original_bytes:
+        print(f"images: {original_bytes / 1024:,.0f} KB -> {optimized_bytes / 1024:,.0f} KB "
+              f"({100 * (1 - optimized_bytes / original_bytes):.0f}% smaller)")
+
+
+if __name__ == "__main__":
+    build()
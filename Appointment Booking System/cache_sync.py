@@ -0,0 +1,88 @@
+"""Cross-worker cache invalidation.
+
+Every worker process has its own clinic cache and rendered-page cache. To
+invalidate them everywhere, bump the cache's version counter in the
+``_cache_versions`` collection. Each worker polls the counters every
+``CACHE_SYNC_INTERVAL`` seconds with one small query, and clears its local
+copy when a version moved. While ``change_feed`` has a change stream open the
+bumps arrive through it instead and polling pauses.
+
+    python cache_sync.py bump clinics     # after editing Clinics by hand
+    python cache_sync.py bump pages       # after changing templates or rerunning build_assets.py without a restart
+"""
+import asyncio
+import logging
+import os
+import sys
+from database import db
+
+logger = logging.getLogger(__name__)
+
+versions_collection = db["_cache_versions"]
+SYNC_INTERVAL = float(os.getenv("CACHE_SYNC_INTERVAL", "5"))
+
+_listeners = {}   # cache name -> [callback]
+_seen = {}        # cache name -> last version this process acted on
+stream_connected = False   # set by change_feed while its change stream is open
+
+
+def register(name: str, callback):
+    """Call ``callback()`` in this process whenever ``name``'s version is bumped anywhere."""
+    _listeners.setdefault(name, []).append(callback)
+
+
+async def bump(name: str):
+    """Invalidate ``name`` in every worker, this one included (immediately)."""
+    result = await versions_collection.find_one_and_update(
+        {"_id": name}, {"$inc": {"version": 1}}, upsert=True, return_document=True
+    )
+    _seen[name] = result["version"]
+    _notify(name)
+
+
+def _notify(name):
+    for callback in _listeners.get(name, []):
+        callback()
+
+
+def apply_version(name, version):
+    if _seen.get(name) == version:
+        return
+    first_sight = name not in _seen
+    _seen[name] = version
+    if not first_sight:  # the first poll at startup only records the baseline
+        _notify(name)
+
+
+def stats():
+    return dict(_seen)
+
+
+async def sync_once():
+    names = list(_listeners)
+    found = set()
+    async for doc in versions_collection.find({"_id": {"$in": names}}):
+        found.add(doc["_id"])
+        apply_version(doc["_id"], doc.get("version", 0))
+    # Never bumped yet: version 0 is the baseline, so the first real bump counts as a change
+    for name in names:
+        if name not in found:
+            _seen.setdefault(name, 0)
+
+
+async def run_sync_loop():
+    """Background task started from the app lifespan."""
+    while True:
+        try:
+            if not stream_connected:
+                await sync_once()
+        except Exception as exc:  # keep polling through transient DB errors
+            logger.warning("Cache version sync failed: %s", exc)
+        await asyncio.sleep(SYNC_INTERVAL)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != "bump":
+        sys.exit("usage: python cache_sync.py bump <cache-name>")
+    asyncio.run(bump(sys.argv[2]))
+    print(f"Bumped {sys.argv[2]}")
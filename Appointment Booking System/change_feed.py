@@ -0,0 +1,192 @@
+"""Change-stream watcher: live dashboard updates and cache invalidation.
+
+Each worker opens one change stream over the collections below and turns the
+changes into in-process effects:
+
+* ``Appointments`` - pushed to the owning doctor's open dashboards via the
+  broadcaster (only looked up when someone is listening), and as slot
+  taken/freed events to booking pages open on that doctor and date.
+* ``Doctors`` - moderation/status changes pushed to that doctor's dashboards;
+  name/specialization/clinic/status changes re-indexed for search.
+* ``Clinics`` - the changed clinic is dropped from ``clinic_cache`` and its
+  doctors re-indexed for search.
+* ``_cache_versions`` - applied by ``cache_sync``, which stops polling while
+  the stream is open.
+
+Change streams need a replica set (Atlas, or locally
+``mongod --replSet rs0`` followed by ``rs.initiate()``). On a standalone server
+the watcher logs once and exits, and ``cache_sync`` keeps polling. Servers
+before 6.0 have no pre-images: the stream reopens without them, and deletes
+are then broadcast to every open dashboard.
+"""
+import asyncio
+import logging
+from pymongo.errors import OperationFailure, PyMongoError
+import cache_sync
+import search
+from appointments import doctor_row
+from broadcaster import broadcaster
+from clinic_cache import clinic_cache
+from database import db
+
+logger = logging.getLogger(__name__)
+
+WATCHED = ["Appointments", "Doctors", "Clinics", "_cache_versions"]
+# Doctor fields that matter to an open dashboard; schedule_version bumps on every booking and is ignored
+DOCTOR_FIELDS = {"status", "full_name"}
+SLOT_FIELDS = {"doctor_id", "date", "slot"}
+NOT_A_REPLICA_SET = 40573
+HISTORY_LOST = 286
+UNKNOWN_FIELD = 40415  # how pre-6.0 servers reject fullDocumentBeforeChange
+RETRY_SECONDS = 5
+
+
+def doctor_topic(doctor_id):
+    return ("doctor", str(doctor_id))
+
+
+def slots_topic(doctor_id, date):
+    return ("slots", str(doctor_id), date)
+
+
+def _slot_key(appt):
+    return appt["doctor_id"], appt["date"], appt["slot"]
+
+
+def _slot_event(appt, appointment_id, taken):
+    return {"type": "slot", "date": appt["date"], "slot": appt["slot"],
+            "taken": taken, "appointment_id": appointment_id}
+
+
+def _publish_slot_changes(change, appt, before, appointment_id):
+    """Booking pages for the affected doctor/date: the old slot freed, the new one taken."""
+    if change["operationType"] == "update" and not SLOT_FIELDS & set(change["updateDescription"]["updatedFields"]):
+        return
+    moved = before is None or appt is None or _slot_key(before) != _slot_key(appt)
+    if before and moved:
+        broadcaster.publish(slots_topic(before["doctor_id"], before["date"]),
+                            _slot_event(before, appointment_id, taken=False))
+    elif before is None and change["operationType"] != "insert":
+        # No pre-image, so the freed slot is unknown: open pages for the doctor (or everyone) refetch
+        doctor_id = str(appt["doctor_id"]) if appt else None
+        for topic in broadcaster.topics("slots"):
+            if doctor_id is None or topic[1] == doctor_id:
+                broadcaster.publish(topic, {"type": "resync"})
+    if appt and moved:
+        broadcaster.publish(slots_topic(appt["doctor_id"], appt["date"]),
+                            _slot_event(appt, appointment_id, taken=True))
+
+
+async def _appointment_change(change):
+    op = change["operationType"]
+    appointment_id = str(change["documentKey"]["_id"])
+    # The pre-image (collection option enabled by migration 0003) says where it was before
+    before = change.get("fullDocumentBeforeChange")
+    appt = change.get("fullDocument") if op != "delete" else None
+    if op != "delete" and not appt:
+        return  # deleted again before the lookup; its delete event follows
+    _publish_slot_changes(change, appt, before, appointment_id)
+
+    # Holds only matter to booking pages until they're confirmed
+    if (appt or before or {}).get("status") == "held":
+        return
+    removed = {"type": "appointment", "op": "delete", "appointment_id": appointment_id}
+    if op == "delete":
+        if before:
+            broadcaster.publish(doctor_topic(before["doctor_id"]), removed)
+        else:
+            broadcaster.publish_all("doctor", removed)
+        return
+    if before and before["doctor_id"] != appt["doctor_id"]:
+        broadcaster.publish(doctor_topic(before["doctor_id"]), removed)
+    topic = doctor_topic(appt["doctor_id"])
+    if not broadcaster.has_subscribers(topic):
+        return
+    row = await doctor_row(appt)
+    if row:
+        broadcaster.publish(topic, {"type": "appointment", "op": "upsert", "row": row})
+
+
+def _doctor_change(change):
+    if change["operationType"] == "update":
+        changed = set(change["updateDescription"]["updatedFields"])
+        if not changed & DOCTOR_FIELDS:
+            return
+    doctor = change.get("fullDocument") or {}
+    broadcaster.publish(doctor_topic(change["documentKey"]["_id"]),
+                        {"type": "doctor", "status": doctor.get("status")})
+
+
+async def _search_change(change):
+    op = change["operationType"]
+    if op == "delete":
+        search.remove_doctor(change["documentKey"]["_id"])
+    elif op != "update" or set(change["updateDescription"]["updatedFields"]) & search.INDEXED_FIELDS:
+        if change.get("fullDocument"):
+            await search.upsert_doctor(change["fullDocument"])
+
+
+async def handle_change(change):
+    collection = change["ns"]["coll"]
+    if collection == "Appointments":
+        await _appointment_change(change)
+    elif collection == "Doctors":
+        _doctor_change(change)
+        await _search_change(change)
+    elif collection == "Clinics":
+        clinic_cache.invalidate(change["documentKey"]["_id"])
+        await search.refresh_clinic(change["documentKey"]["_id"])
+    elif collection == "_cache_versions" and change.get("fullDocument"):
+        doc = change["fullDocument"]
+        cache_sync.apply_version(doc["_id"], doc.get("version", 0))
+
+
+async def _resync_everything():
+    """Events may have been missed: drop caches, rebuild search and have open pages reload."""
+    clinic_cache.invalidate()
+    try:
+        await search.load()
+    except PyMongoError as exc:
+        logger.warning("Search index rebuild failed: %s", exc)  # the refresh loop retries
+    broadcaster.publish_all("doctor", {"type": "resync"})
+    broadcaster.publish_all("slots", {"type": "resync"})
+
+
+async def watch_changes():
+    """Background task started from the app lifespan; reconnects and resumes after errors."""
+    pipeline = [{"$match": {"ns.coll": {"$in": WATCHED}}}]
+    resume_token = None
+    pre_images = True
+    while True:
+        options = {"full_document": "updateLookup", "resume_after": resume_token}
+        if pre_images:
+            options["full_document_before_change"] = "whenAvailable"
+        try:
+            async with await db.watch(pipeline, **options) as stream:
+                cache_sync.stream_connected = True
+                # Anything bumped while the stream was down is picked up here
+                await cache_sync.sync_once()
+                async for change in stream:
+                    try:
+                        await handle_change(change)
+                    except Exception as exc:  # one bad event must not stop the feed
+                        logger.warning("Change %s on %s not handled: %s",
+                                       change.get("operationType"), change.get("ns"), exc)
+                    resume_token = stream.resume_token
+        except OperationFailure as exc:
+            if exc.code == NOT_A_REPLICA_SET:
+                logger.info("Change streams unavailable (not a replica set); caches fall back to polling")
+                return
+            if pre_images and (exc.code == UNKNOWN_FIELD or "fullDocumentBeforeChange" in str(exc)):
+                logger.info("Change-stream pre-images unsupported (MongoDB < 6.0); watching without them")
+                pre_images = False
+                continue
+            if exc.code == HISTORY_LOST:
+                resume_token = None
+                await _resync_everything()
+            logger.warning("Change stream failed: %s", exc)
+        except PyMongoError as exc:
+            logger.warning("Change stream interrupted: %s", exc)
+        finally:
+            cache_sync.stream_connected = False
+        await asyncio.sleep(RETRY_SECONDS)
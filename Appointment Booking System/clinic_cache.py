@@ -0,0 +1,100 @@
+import os
+import time
+from collections import OrderedDict
+from database import clinic_collection
+
+
+class ClinicCache:
+    """In-process cache of ``Clinics`` documents keyed by ``_id``.
+
+    Entries expire after ``ttl`` seconds and the least recently used ones are
+    evicted once ``max_size`` is reached. Anything that writes to ``Clinics``
+    should call ``invalidate()`` afterwards. Cached documents are shared, so
+    callers must not mutate them.
+    """
+
+    def __init__(self, ttl: float = 300, max_size: int = 1024):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()   # _id -> (expires_at, doc)
+        self._listing = None            # (expires_at, [docs]) for the full directory
+        self.hits = 0
+        self.misses = 0
+
+    def _fresh(self, clinic_id):
+        entry = self._entries.get(clinic_id)
+        if entry is None:
+            return None
+        expires_at, doc = entry
+        if expires_at < time.monotonic():
+            del self._entries[clinic_id]
+            return None
+        self._entries.move_to_end(clinic_id)
+        return doc
+
+    def _put(self, doc):
+        self._entries[doc["_id"]] = (time.monotonic() + self.ttl, doc)
+        self._entries.move_to_end(doc["_id"])
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def get(self, clinic_id):
+        return (await self.get_many([clinic_id])).get(clinic_id)
+
+    async def get_many(self, clinic_ids):
+        """Return ``{_id: clinic}`` for the given ids; all misses are loaded in one ``$in`` query."""
+        found, missing = {}, []
+        for clinic_id in set(clinic_ids):
+            if clinic_id is None:
+                continue
+            doc = self._fresh(clinic_id)
+            if doc is None:
+                missing.append(clinic_id)
+            else:
+                found[clinic_id] = doc
+
+        self.hits += len(found)
+        self.misses += len(missing)
+        if missing:
+            async for doc in clinic_collection.find({"_id": {"$in": missing}}):
+                self._put(doc)
+                found[doc["_id"]] = doc
+        return found
+
+    async def all(self):
+        """Every clinic, for dropdowns such as doctor registration."""
+        if self._listing and self._listing[0] >= time.monotonic():
+            self.hits += 1
+            return self._listing[1]
+
+        self.misses += 1
+        docs = await clinic_collection.find({}).to_list(None)
+        for doc in docs:
+            self._put(doc)
+        self._listing = (time.monotonic() + self.ttl, docs)
+        return docs
+
+    def invalidate(self, clinic_id=None):
+        """Drop one clinic (or everything when ``clinic_id`` is None)."""
+        self._listing = None
+        if clinic_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(clinic_id, None)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else None,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+        }
+
+
+clinic_cache = ClinicCache(
+    ttl=float(os.getenv("CLINIC_CACHE_TTL", "300")),
+    max_size=int(os.getenv("CLINIC_CACHE_SIZE", "1024")),
+)
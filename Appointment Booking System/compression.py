@@ -0,0 +1,149 @@
+"""gzip/brotli compression for dynamic responses.
+
+Static build output is precompressed by build_assets.py instead, so this
+middleware leaves responses that already carry a Content-Encoding alone.
+"""
+import gzip
+import os
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "4"))  # fast enough to do per request
+COMPRESSIBLE_TYPES = (
+    "text/html", "text/css", "text/plain", "text/javascript",
+    "application/javascript", "application/json", "image/svg+xml",
+)
+
+
+def accepted_encodings(accept_encoding: str) -> set:
+    """Codings from an Accept-Encoding header, minus any sent with ``q=0``."""
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        q = params.strip()
+        if q.startswith("q=") and q[2:].strip() in ("0", "0.0", "0.00", "0.000"):
+            continue
+        accepted.add(name.strip())
+    return accepted
+
+
+def choose_encoding(accept_encoding: str):
+    accepted = accepted_encodings(accept_encoding)
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """A strong ETag names one byte-for-byte body, so a compressed body gets its own: ``"abc"`` -> ``"abc-br"``.
+
+    Weak ETags are left alone (they already allow differing bytes).
+    """
+    if not etag.startswith('"') or not etag.endswith('"'):
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def _decoded_etags(if_none_match: str) -> dict:
+    """Tags in If-None-Match that ``encoded_etag`` produced, mapped to the app's own tag."""
+    decoded = {}
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        for encoding in ("br", "gzip"):
+            suffix = f'-{encoding}"'
+            if tag.startswith('"') and tag.endswith(suffix):
+                decoded[tag] = tag[:-len(suffix)] + '"'
+    return decoded
+
+
+def compress(body: bytes, encoding: str, gzip_level: int = GZIP_LEVEL, brotli_quality: int = BROTLI_QUALITY) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=brotli_quality)
+    return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+
+
+class CompressionMiddleware:
+    """Compress single-chunk responses of an allowlisted type above ``MIN_SIZE``.
+
+    Streaming responses (SSE and friends) are passed through untouched. A strong
+    ``ETag`` on a compressed body gets an encoding suffix; the suffix is stripped
+    from ``If-None-Match`` on the way in, so routes only ever compare their own
+    tags, and put back on the ``304``.
+    """
+
+    def __init__(self, app, minimum_size: int = MIN_SIZE, content_types=COMPRESSIBLE_TYPES):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.content_types = content_types
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request_headers = Headers(scope=scope)
+        encoding = choose_encoding(request_headers.get("accept-encoding", ""))
+        decoded = _decoded_etags(request_headers.get("if-none-match", ""))
+        if encoding is None and not decoded:
+            return await self.app(scope, receive, send)
+        if decoded:
+            if_none_match = ", ".join(decoded.get(tag.strip(), tag.strip())
+                                      for tag in request_headers["if-none-match"].split(","))
+            scope = dict(scope, headers=[(k, v) for k, v in scope["headers"] if k != b"if-none-match"]
+                         + [(b"if-none-match", if_none_match.encode("latin-1"))])
+            # The client's own tag for each base tag, to answer a 304 with what it has cached
+            sent_tags = {base: tag for tag, base in decoded.items()}
+
+        start_message = None
+        passthrough = encoding is None
+
+        async def wrapped_send(message):
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                if message["status"] == 304 and decoded:
+                    headers = MutableHeaders(raw=message["headers"])
+                    if headers.get("etag") in sent_tags:
+                        headers["ETag"] = sent_tags[headers["etag"]]
+                if passthrough:
+                    return await send(message)
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                return await send(message)
+
+            if start_message is not None:
+                start, start_message = start_message, None
+                headers = MutableHeaders(raw=start["headers"])
+                body = message.get("body", b"")
+                media_type = headers.get("content-type", "").split(";")[0].strip()
+                if (message.get("more_body")
+                        or "content-encoding" in headers
+                        or len(body) < self.minimum_size
+                        or media_type not in self.content_types):
+                    passthrough = True
+                    if media_type in self.content_types:
+                        headers.add_vary_header("Accept-Encoding")
+                    await send(start)
+                    return await send(message)
+
+                body = compress(body, encoding)
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+                if "etag" in headers:
+                    headers["ETag"] = encoded_etag(headers["etag"], encoding)
+                headers.add_vary_header("Accept-Encoding")
+                await send(start)
+                return await send({"type": "http.response.body", "body": body})
+
+            await send(message)
+
+        await self.app(scope, receive, wrapped_send)
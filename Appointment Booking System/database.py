@@ -0,0 +1,18 @@
+from pymongo import AsyncMongoClient
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+# Async PyMongo client - every route awaits its queries through this module
+# so a slow query never blocks the uvicorn event loop.
+mongo_uri = os.getenv('MONGO_URI')
+client = AsyncMongoClient(mongo_uri, maxPoolSize=int(os.getenv("MONGO_MAX_POOL_SIZE", "100")))
+APP_DB_NAME = "ApoointmentBooking"
+# Overridden only by scripts that must never touch live data (see benchmarks/bench_db.py)
+db = client[os.getenv("MONGO_DB_NAME", APP_DB_NAME)]
+
+patient_collection = db["Patients"]
+doctor_collection = db["Doctors"]
+appointment_collection = db["Appointments"]
+clinic_collection = db["Clinics"]
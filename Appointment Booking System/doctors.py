@@ -0,0 +1,137 @@
+import re
+from collections import Counter
+from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
+from database import db, doctor_collection
+
+STATUSES = ("pending", "approved", "denied")
+ADMIN_FIELDS = {"full_name": 1, "email": 1, "specialization": 1, "status": 1}
+# Audit entries keep at most this many doctor ids (plus counts), staying far below the 16 MB document limit
+AUDIT_ID_LIMIT = 1000
+
+
+def status_filter(status: str):
+    # Doctors created before the status field existed count as pending
+    if status == "pending":
+        return {"$or": [{"status": "pending"}, {"status": {"$exists": False}}]}
+    return {"status": status}
+
+
+def search_filter(search: str):
+    if not search:
+        return {}
+    pattern = {"$regex": re.escape(search.strip()), "$options": "i"}
+    return {"$or": [{"full_name": pattern}, {"email": pattern}, {"specialization": pattern}]}
+
+
+async def doctor_status_counts(search: str = None):
+    """``{"pending": n, "approved": n, "denied": n}`` from a single ``$group``."""
+    pipeline = [
+        {"$match": search_filter(search)},
+        {"$group": {"_id": {"$ifNull": ["$status", "pending"]}, "count": {"$sum": 1}}},
+    ]
+    counts = dict.fromkeys(STATUSES, 0)
+    async for row in await doctor_collection.aggregate(pipeline):
+        counts[row["_id"]] = counts.get(row["_id"], 0) + row["count"]
+    return counts
+
+
+async def doctor_page(status: str, search: str = None, after: ObjectId = None, limit: int = 50):
+    """One keyset-paginated page of doctors with ``status``, ordered by ``_id``.
+
+    Returns ``(doctors, next_after)``; ``next_after`` is None on the last page.
+    """
+    clauses = [status_filter(status)]
+    if search:
+        clauses.append(search_filter(search))
+    if after:
+        clauses.append({"_id": {"$gt": after}})
+
+    doctors = await doctor_collection.find(
+        {"$and": clauses}, ADMIN_FIELDS
+    ).sort("_id", 1).limit(limit + 1).to_list(None)
+
+    next_after = doctors[limit - 1]["_id"] if len(doctors) > limit else None
+    return doctors[:limit], next_after
+
+
+def moderation_update(action: str):
+    if action == "approve":
+        return {"status": "approved", "is_approved": True, "approved_at": datetime.utcnow()}
+    return {"status": "denied", "is_approved": False, "approved_at": None}
+
+
+def _check_action(action: str) -> str:
+    if action not in ("approve", "deny"):
+        raise ValueError(f"Unknown moderation action: {action}")
+    return "approved" if action == "approve" else "denied"
+
+
+async def _audit(action: str, actor: str, criteria: dict, counts: dict, doctor_ids=(), updated=()):
+    await db["AdminAudit"].insert_one({
+        "action": action,
+        "actor": actor,
+        "criteria": criteria,
+        "counts": counts,
+        "doctor_ids": list(doctor_ids[:AUDIT_ID_LIMIT]),
+        "updated": list(updated[:AUDIT_ID_LIMIT]),
+        "truncated": max(len(doctor_ids), len(updated)) > AUDIT_ID_LIMIT,
+        "at": datetime.utcnow(),
+    })
+
+
+async def moderate_matching(status: str, search: str, action: str, actor: str = None):
+    """Approve or deny every doctor with ``status`` matching ``search``, filtered server-side.
+
+    One ``update_many`` on the filter itself - no ids are loaded - and the audit
+    entry records the criteria and counts. Returns ``{"updated": n}`` or ``{"unchanged": n}``.
+    """
+    target = _check_action(action)
+    clauses = [status_filter(status)]
+    if search:
+        clauses.append(search_filter(search))
+    query = {"$and": clauses}
+
+    if status == target:
+        counts = {"unchanged": await doctor_collection.count_documents(query)}
+    else:
+        result = await doctor_collection.update_many(query, {"$set": moderation_update(action)})
+        counts = {"updated": result.modified_count}
+    await _audit(action, actor, {"status": status, "q": search}, counts)
+    return counts
+
+
+async def moderate_doctors(doctor_ids, action: str, actor: str = None, criteria: dict = None):
+    """Approve or deny many doctors with one ``update_many`` and record an audit entry.
+
+    Returns ``{doctor_id: "updated" | "unchanged" | "not_found" | "invalid"}``.
+    """
+    target = _check_action(action)
+
+    results, ids = {}, []
+    for raw in doctor_ids:
+        try:
+            ids.append(ObjectId(raw))
+        except (InvalidId, TypeError):
+            results[str(raw)] = "invalid"
+
+    current = {
+        d["_id"]: d.get("status", "pending")
+        async for d in doctor_collection.find({"_id": {"$in": ids}}, {"status": 1})
+    }
+    to_update = []
+    for oid in ids:
+        if oid not in current:
+            results[str(oid)] = "not_found"
+        elif current[oid] == target:
+            results[str(oid)] = "unchanged"
+        else:
+            results[str(oid)] = "updated"
+            to_update.append(oid)
+
+    if to_update:
+        await doctor_collection.update_many({"_id": {"$in": to_update}}, {"$set": moderation_update(action)})
+
+    await _audit(action, actor, criteria, dict(Counter(results.values())), ids, to_update)
+    return results
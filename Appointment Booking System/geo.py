@@ -0,0 +1,119 @@
+"""Clinic coordinates and "nearest doctors" listings.
+
+Clinics carry a GeoJSON ``location`` (``{"type": "Point", "coordinates": [lng, lat]}``)
+under a ``2dsphere`` index. ``nearest_doctors`` answers a specialty listing
+around a point with one aggregation: ``$geoNear`` over Clinics (nearest first,
+bounded by the radius), then a ``$lookup`` of that specialty's doctors at each
+clinic through the (specialization, clinic_id) index.
+
+Coordinates are loaded from a CSV of ``clinic_id,lat,lng`` rows:
+
+    python geo.py import clinic_locations.csv
+"""
+import argparse
+import asyncio
+import csv
+import os
+from bson import ObjectId
+from pymongo import UpdateOne
+import cache_sync
+from database import clinic_collection
+
+DEFAULT_RADIUS_KM = float(os.getenv("NEAREST_RADIUS_KM", "10"))
+MAX_RADIUS_KM = 200
+NEAREST_LIMIT = int(os.getenv("NEAREST_LIMIT", "50"))
+
+
+def valid_coordinates(lat, lng) -> bool:
+    return lat is not None and lng is not None and -90 <= lat <= 90 and -180 <= lng <= 180
+
+
+def point(lat: float, lng: float) -> dict:
+    # GeoJSON order is [longitude, latitude]
+    return {"type": "Point", "coordinates": [lng, lat]}
+
+
+async def nearest_doctors(specialization: str, lat: float, lng: float, radius_km: float = None,
+                          clinic_id: ObjectId = None, limit: int = NEAREST_LIMIT):
+    """Doctors of ``specialization`` at clinics within ``radius_km`` of the point, nearest first.
+
+    Rows have the shape the specialty listing renders, plus ``distance_km``.
+    Clinics without coordinates never match.
+    """
+    radius_km = min(radius_km or DEFAULT_RADIUS_KM, MAX_RADIUS_KM)
+    geo_near = {
+        "near": point(lat, lng),
+        "distanceField": "distance_m",
+        "maxDistance": radius_km * 1000,
+        "spherical": True,
+    }
+    if clinic_id:
+        geo_near["query"] = {"_id": clinic_id}
+
+    pipeline = [
+        {"$geoNear": geo_near},
+        {"$project": {"name": 1, "address": 1, "distance_m": 1}},
+        {"$lookup": {
+            "from": "Doctors",
+            "localField": "_id",
+            "foreignField": "clinic_id",
+            "pipeline": [
+                {"$match": {"specialization": specialization}},
+                {"$project": {"full_name": 1, "specialization": 1, "opening_hours": 1,
+                              "closing_hours": 1, "phone_number": 1}},
+            ],
+            "as": "doctor",
+        }},
+        {"$unwind": "$doctor"},
+        {"$limit": limit},
+        {"$project": {
+            "_id": {"$toString": "$doctor._id"},
+            "full_name": "$doctor.full_name",
+            "specialization": "$doctor.specialization",
+            "opening_hours": "$doctor.opening_hours",
+            "closing_hours": "$doctor.closing_hours",
+            "phone_number": "$doctor.phone_number",
+            "clinic_name": "$name",
+            "clinic_address": "$address",
+            "distance_km": {"$round": [{"$divide": ["$distance_m", 1000]}, 1]},
+        }},
+    ]
+    cursor = await clinic_collection.aggregate(pipeline)
+    return await cursor.to_list(None)
+
+
+async def import_locations(path: str):
+    """Set ``location`` on each clinic listed in a ``clinic_id,lat,lng`` CSV; returns (updated, skipped)."""
+    ops, skipped = [], 0
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            try:
+                clinic_id, lat, lng = ObjectId(row["clinic_id"]), float(row["lat"]), float(row["lng"])
+            except (KeyError, TypeError, ValueError):
+                skipped += 1
+                continue
+            if not valid_coordinates(lat, lng):
+                skipped += 1
+                continue
+            ops.append(UpdateOne({"_id": clinic_id}, {"$set": {"location": point(lat, lng)}}))
+
+    updated = 0
+    for i in range(0, len(ops), 1000):
+        result = await clinic_collection.bulk_write(ops[i:i + 1000], ordered=False)
+        updated += result.modified_count
+    await cache_sync.bump("clinics")
+    return updated, skipped
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Manage clinic coordinates.")
+    parser.add_argument("command", choices=["import"])
+    parser.add_argument("csv_path", help="CSV with clinic_id,lat,lng columns")
+    args = parser.parse_args()
+
+    updated, skipped = await import_locations(args.csv_path)
+    print(f"{updated} clinic(s) updated, {skipped} row(s) skipped")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,43 @@
+"""Multi-process serving: gunicorn managing uvicorn workers.
+
+    gunicorn main:app -c gunicorn_conf.py
+
+One worker per usable CPU unless WEB_CONCURRENCY says otherwise. The app is
+imported once in the master (``preload_app``) and forked, so workers boot fast
+and share the imported code pages. Nothing touches the network at import time:
+the Mongo client connects lazily inside each worker, and each worker's lifespan
+runs its own warm-up.
+
+``kill -HUP <master>`` starts fresh workers and lets the old ones finish their
+in-flight requests (up to ``graceful_timeout``) before they exit. With
+``preload_app`` the new workers are forked from the master's already-imported
+app, so HUP does *not* pick up new code: it only recycles workers (and rereads
+this config). Deploying code needs a full restart of the master, which is what
+each Render deploy does.
+
+Caches (clinic data, rendered pages) live per worker; ``cache_sync`` keeps them
+coherent across workers through a version counter in Mongo.
+"""
+import os
+
+
+def _cpu_count() -> int:
+    try:
+        return len(os.sched_getaffinity(0))  # respects container CPU pinning
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", _cpu_count()))
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = True
+
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+# Recycle workers now and then so slow leaks can't accumulate; jitter avoids all restarting at once
+max_requests = int(os.getenv("MAX_REQUESTS", "10000"))
+max_requests_jitter = max_requests // 10
+
+accesslog = "-"
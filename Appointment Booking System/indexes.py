@@ -0,0 +1,135 @@
+"""Index registry for every hot query shape in main.py.
+
+``ensure_indexes()`` runs as part of ``python migrations.py migrate``. To verify
+that no canonical query falls back to a collection scan:
+
+    python indexes.py --check
+"""
+import argparse
+import asyncio
+import logging
+import sys
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ASCENDING, GEOSPHERE
+from pymongo.errors import OperationFailure
+from database import db
+
+logger = logging.getLogger(__name__)
+
+# collection -> [(keys, options)]
+INDEXES = {
+    "Appointments": [
+        # One appointment per doctor/date/slot - bookings rely on this to reject double-booking.
+        # Also serves doctor_id lookups and availability date ranges.
+        ([("doctor_id", ASCENDING), ("date", ASCENDING), ("slot", ASCENDING)],
+         {"name": "doctor_date_slot_unique", "unique": True}),
+        # Dashboard listings: time windows + keyset pagination on (start_at, _id)
+        ([("patient_id", ASCENDING), ("start_at", ASCENDING), ("_id", ASCENDING)], {"name": "patient_start_id"}),
+        ([("doctor_id", ASCENDING), ("start_at", ASCENDING), ("_id", ASCENDING)], {"name": "doctor_start_id"}),
+        # Slot holds carry hold_expires_at and are deleted once it passes; bookings don't have the field
+        ([("hold_expires_at", ASCENDING)], {"name": "hold_ttl", "expireAfterSeconds": 0}),
+    ],
+    "Patients": [
+        ([("email", ASCENDING)], {"name": "email"}),
+    ],
+    "Doctors": [
+        ([("email", ASCENDING)], {"name": "email"}),
+        # Admin dashboard lists each status in _id order (keyset pagination)
+        ([("status", ASCENDING), ("_id", ASCENDING)], {"name": "status_id"}),
+        ([("specialization", ASCENDING), ("clinic_id", ASCENDING)], {"name": "specialization_clinic"}),
+    ],
+    "Users": [
+        ([("email", ASCENDING)], {"name": "email"}),
+    ],
+    "Clinics": [
+        # GeoJSON points for nearest-clinic listings ($geoNear); clinics without one are skipped
+        ([("location", GEOSPHERE)], {"name": "location_2dsphere"}),
+    ],
+}
+
+# (description, collection, filter, sort) for each query shape a route issues
+CANONICAL_QUERIES = [
+    ("login / register: patient by email", "Patients", {"email": "x@example.com"}, None),
+    ("login / register: doctor by email", "Doctors", {"email": "x@example.com"}, None),
+    ("/token: user by email", "Users", {"email": "x@example.com"}, None),
+    ("admin dashboard: doctors by status", "Doctors",
+     {"$and": [{"status": "approved"}, {"_id": {"$gt": ObjectId()}}]}, [("_id", 1)]),
+    ("specialty pages: doctors by specialization", "Doctors", {"specialization": "Cardiology"}, None),
+    ("specialty pages: doctors by specialization + clinic", "Doctors",
+     {"specialization": "Cardiology", "clinic_id": ObjectId()}, None),
+    ("doctor register: existing doctor", "Doctors",
+     {"full_name": "x", "specialization": "Cardiology", "clinic_id": ObjectId()}, None),
+    ("patient dashboard: upcoming appointments", "Appointments",
+     {"patient_id": ObjectId(), "start_at": {"$gte": datetime(2000, 1, 1)}}, [("start_at", 1), ("_id", 1)]),
+    ("patient dashboard: past appointments", "Appointments",
+     {"patient_id": ObjectId(), "start_at": {"$lt": datetime(2000, 1, 1)}}, [("start_at", -1), ("_id", -1)]),
+    ("doctor dashboard: upcoming appointments", "Appointments",
+     {"doctor_id": ObjectId(), "start_at": {"$gte": datetime(2000, 1, 1)}}, [("start_at", 1), ("_id", 1)]),
+    ("availability: doctor's date range", "Appointments",
+     {"doctor_id": ObjectId(), "date": {"$gte": "2000-01-01", "$lte": "2000-01-14"}}, None),
+    ("booking page: appointments by doctor", "Appointments", {"doctor_id": ObjectId()}, None),
+    ("specialty pages: clinics near a point", "Clinics",
+     {"location": {"$nearSphere": {"$geometry": {"type": "Point", "coordinates": [77.59, 12.97]},
+                                   "$maxDistance": 10000}}}, None),
+    ("booking: slot conflict", "Appointments",
+     {"doctor_id": ObjectId(), "date": "2000-01-01", "slot": "10:00 AM"}, None),
+]
+
+
+async def ensure_indexes():
+    """Create every declared index. Safe to run on each startup; existing indexes are left alone.
+
+    A unique index that can't be built is fatal: bookings depend on it to reject
+    double-booking, so serving without it would accept duplicates silently.
+    """
+    for collection, specs in INDEXES.items():
+        for keys, options in specs:
+            try:
+                await db[collection].create_index(keys, **options)
+            except OperationFailure as exc:
+                logger.error("Could not create index %s on %s: %s", options.get("name"), collection, exc)
+                if options.get("unique"):
+                    raise
+
+
+def _plan_stages(plan):
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _plan_stages(item)
+
+
+async def check_queries():
+    """Explain every canonical query; returns the descriptions of those that COLLSCAN."""
+    failures = []
+    for description, collection, query, sort in CANONICAL_QUERIES:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = (await cursor.explain())["queryPlanner"]["winningPlan"]
+        stages = set(_plan_stages(plan))
+        ok = "COLLSCAN" not in stages
+        print(f"{'ok  ' if ok else 'FAIL'} {collection:13s} {description}  [{', '.join(sorted(stages))}]")
+        if not ok:
+            failures.append(description)
+    return failures
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Create indexes and verify query plans.")
+    parser.add_argument("--check", action="store_true", help="explain canonical queries and fail on COLLSCAN")
+    args = parser.parse_args()
+
+    await ensure_indexes()
+    print("Indexes ensured.")
+    if args.check and await check_queries():
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,39 +1,116 @@
 from fastapi import FastAPI, Request, Form, status, Query, Depends, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse
+from typing import List
+from collections import Counter
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from starlette.middleware.sessions import SessionMiddleware
 from starlette.responses import RedirectResponse
-from passlib.hash import bcrypt
-from passlib.context import CryptContext
-from pymongo import MongoClient
 from bson import ObjectId
-from datetime import datetime
+from datetime import datetime, timedelta
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 import os
-from authlib.integrations.starlette_client import OAuth
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
+from database import client, db, patient_collection, doctor_collection
+from appointments import patient_appointments, doctor_appointments, book_slot, hold_slot, confirm_hold, reschedule_appointment, touch_schedule, WINDOWS
+from clinic_cache import clinic_cache
+import cache_sync
+from change_feed import watch_changes, doctor_topic, slots_topic
+from broadcaster import broadcaster, sse_response
+import search
+from geo import nearest_doctors, valid_coordinates, DEFAULT_RADIUS_KM
+from passwords import hash_password, verify_password
+import passwords
+from availability import get_availability, doctor_slots, free_slots, slot_start, slot_minutes, utcnow, local_today, BOOKING_WINDOW_DAYS
+import hashlib
+from assets import static_url, picture, background_image, load_manifest, ImmutableStaticFiles
+from compression import CompressionMiddleware
+from page_cache import PageCache
+from doctors import doctor_status_counts, doctor_page, moderate_doctors, moderate_matching, STATUSES as DOCTOR_STATUSES
+from html import escape
+from urllib.parse import urlencode
 
 load_dotenv()
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
+
+_oauth = None
+
+def google_oauth():
+    """Google OAuth client, registered (and authlib imported) on first use."""
+    global _oauth
+    if _oauth is None:
+        from authlib.integrations.starlette_client import OAuth
+        _oauth = OAuth()
+        _oauth.register(
+            name="google",
+            client_id=os.getenv("GOOGLE_CLIENT_ID"),
+            client_secret=os.getenv("GOOGLE_CLIENT_SECRET"),
+            server_metadata_url="https://accounts.google.com/.well-known/openid-configuration",
+            client_kwargs={"scope": "openid email profile"},
+        )
+    return _oauth.google
 
-app.add_middleware(SessionMiddleware, secret_key=os.getenv("SECRET_KEY", "dev-secret"))
 
-oauth = OAuth()
-oauth.register(
-    name="google",
-    client_id=os.getenv("GOOGLE_CLIENT_ID"),
-    client_secret=os.getenv("GOOGLE_CLIENT_SECRET"),
-    server_metadata_url="https://accounts.google.com/.well-known/openid-configuration",
-    client_kwargs={"scope": "openid email profile"},
-)
+async def warm_up(app: FastAPI):
+    """Initialise dependencies concurrently once the server is already accepting connections.
+
+    Requests arriving earlier still work - each dependency also initialises lazily
+    on first use - but /readyz reports 503 until the database answers.
+    """
+    start = time.perf_counter()
+    steps = {
+        "mongo": client.admin.command("ping"),
+        "google_oauth": google_oauth().load_server_metadata(),
+    }
+    if os.getenv("RUN_MIGRATIONS_ON_STARTUP"):
+        # Local dev only - deployments run `python migrations.py migrate` before starting
+        from migrations import migrate
+        steps["migrations"] = migrate()
+
+    results = await asyncio.gather(*steps.values(), return_exceptions=True)
+    for name, result in zip(steps, results):
+        ok = not isinstance(result, BaseException)
+        app.state.checks[name] = "ok" if ok else f"error: {result}"
+        if not ok:
+            logger.warning("Warm-up step %s failed: %s", name, result)
+    # A failed migrate can mean the unique booking index is missing - don't take traffic without it
+    app.state.ready = all(app.state.checks[name] == "ok" for name in ("mongo", "migrations") if name in steps)
+    app.state.warm_up_seconds = round(time.perf_counter() - start, 3)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.ready = False
+    app.state.checks = {}
+    warm_up_task = asyncio.create_task(warm_up(app))
+    background = [
+        asyncio.create_task(cache_sync.run_sync_loop()),
+        asyncio.create_task(watch_changes()),
+        asyncio.create_task(search.run_refresh_loop()),
+    ]
+    yield
+    warm_up_task.cancel()
+    for task in background:
+        task.cancel()
+    await client.close()
+
+
+app = FastAPI(lifespan=lifespan)
+
+app.add_middleware(SessionMiddleware, secret_key=os.getenv("SECRET_KEY", "dev-secret"))
+app.add_middleware(CompressionMiddleware)
 
 # --- Admin Auth Helpers ---
 from functools import wraps
 
 ADMIN_EMAIL = os.getenv("ADMIN_EMAIL")
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD")
+ADMIN_PAGE_SIZE = int(os.getenv("ADMIN_PAGE_SIZE", "50"))
 
 def require_admin(request: Request):
     if request.session.get("admin") != True:
@@ -45,26 +122,37 @@ def require_admin(request: Request):
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/token")
 @app.post("/token")
 async def token(form_data: OAuth2PasswordRequestForm = Depends()):
-    user = db["Users"].find_one({"email": form_data.username})
-    if not user or not bcrypt.verify(form_data.password, user["password"]):
+    user = await db["Users"].find_one({"email": form_data.username})
+    valid, new_hash = await verify_password(form_data.password, user["password"]) if user else (False, None)
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    if new_hash:
+        await db["Users"].update_one({"_id": user["_id"]}, {"$set": {"password": new_hash}})
     return {"access_token": str(user["_id"]), "token_type": "bearer"}
 
-mongo_uri = os.getenv('MONGO_URI')
-client = MongoClient(mongo_uri)
-db = client["ApoointmentBooking"]  
-
-patient_collection = db["Patients"]
-doctor_collection = db["Doctors"]
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
 
-# One-time migration: set status for existing doctors without it
-doctor_collection.update_many(
-    {"status": {"$exists": False}},
-    {"$set": {"status": "pending", "is_approved": False, "approved_at": None}}
-)
+@app.get("/readyz")
+async def readyz(request: Request):
+    state = request.app.state
+    body = {"ready": state.ready, "checks": state.checks, "warm_up_seconds": getattr(state, "warm_up_seconds", None)}
+    return JSONResponse(body, status_code=200 if state.ready else 503)
 
 # Templates
 templates = Jinja2Templates(directory="templates")
+templates.env.globals["static_url"] = static_url
+templates.env.globals["picture"] = picture
+templates.env.globals["background_image"] = background_image
+page_cache = PageCache(templates, max_size=int(os.getenv("PAGE_CACHE_SIZE", "64")))
+# Per-worker caches; `python cache_sync.py bump <name>` clears them in every worker
+cache_sync.register("clinics", clinic_cache.invalidate)
+# Rebuilt assets get new fingerprints (and the old files are removed), so re-rendered pages need the new manifest
+cache_sync.register("pages", load_manifest)
+cache_sync.register("pages", page_cache.invalidate)
+# Fingerprinted build output (python build_assets.py) is cached forever; must be mounted before /static
+app.mount("/static/dist", ImmutableStaticFiles(directory="static/dist", check_dir=False), name="static-dist")
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 
@@ -74,18 +162,18 @@ async def login_google(request: Request, role: str = None):
     if role:
         request.session["oauth_role"] = role  # remember that this came from the doctor page
     redirect_uri = os.getenv("OAUTH_REDIRECT_URI")
-    return await oauth.google.authorize_redirect(request, redirect_uri)
+    return await google_oauth().authorize_redirect(request, redirect_uri)
 
 
 @app.get("/auth/google/callback")
 async def auth_google_callback(request: Request):
-    token = await oauth.google.authorize_access_token(request)
-    userinfo = token.get("userinfo") or await oauth.google.parse_id_token(request, token)
+    token = await google_oauth().authorize_access_token(request)
+    userinfo = token.get("userinfo") or await google_oauth().parse_id_token(request, token)
     email = userinfo["email"]
     name = userinfo.get("name") or userinfo.get("given_name") or "User"
 
-    patient = db["Patients"].find_one({"email": email})
-    doctor  = db["Doctors"].find_one({"email": email})
+    patient = await db["Patients"].find_one({"email": email})
+    doctor  = await db["Doctors"].find_one({"email": email})
 
     if patient:
         request.session.update({"user": str(patient["_id"]), "role": "patient",
@@ -106,7 +194,7 @@ async def auth_google_callback(request: Request):
     # NEW: first-time Google login; came from doctor page → create a request
     role_hint = request.session.pop("oauth_role", None)
     if role_hint == "doctor":
-        doctor_collection.insert_one({
+        await doctor_collection.insert_one({
             "full_name": name,
             "email": email,
             "specialization": "",
@@ -144,10 +232,10 @@ async def home(request: Request):
     if not user_name and user_id and role:
         try:
             if role == "patient":
-                user = db["Patients"].find_one({"_id": ObjectId(user_id)})
+                user = await db["Patients"].find_one({"_id": ObjectId(user_id)})
                 user_name = user.get("full_name") if user else None
             elif role == "doctor":
-                doc = db["Doctors"].find_one({"_id": ObjectId(user_id)})
+                doc = await db["Doctors"].find_one({"_id": ObjectId(user_id)})
                 user_name = doc.get("full_name") if doc else None
         except Exception:
             pass  # keep whatever we had
@@ -180,7 +268,7 @@ async def choose_role(request: Request):
 
 @app.post("/auth", response_class=HTMLResponse)
 async def login_user(request: Request, email: str = Form(...), password: str = Form(...)):
-    user = db["Users"].find_one({"email": email})
+    user = await db["Users"].find_one({"email": email})
 
     if not user or user["password"] != password:
         return HTMLResponse("Invalid credentials", status_code=401)
@@ -200,18 +288,18 @@ async def login_user(request: Request, email: str = Form(...), password: str = F
 async def login_google(request: Request):
     # optional: add 'next' to return users back where they came from
     redirect_uri = os.getenv("OAUTH_REDIRECT_URI")
-    return await oauth.google.authorize_redirect(request, redirect_uri)
+    return await google_oauth().authorize_redirect(request, redirect_uri)
 
 @app.get("/auth/google/callback")
 async def auth_google_callback(request: Request):
-    token = await oauth.google.authorize_access_token(request)
-    userinfo = token.get("userinfo") or await oauth.google.parse_id_token(request, token)
+    token = await google_oauth().authorize_access_token(request)
+    userinfo = token.get("userinfo") or await google_oauth().parse_id_token(request, token)
     email = userinfo["email"]
     name = userinfo.get("name") or userinfo.get("given_name") or "User"
 
     # Try patient first
-    patient = db["Patients"].find_one({"email": email})
-    doctor  = db["Doctors"].find_one({"email": email})
+    patient = await db["Patients"].find_one({"email": email})
+    doctor  = await db["Doctors"].find_one({"email": email})
 
     if patient:
         user_id, role = str(patient["_id"]), "patient"
@@ -244,15 +332,15 @@ async def post_patient_register(
         gender: str = Form(...),
         address: str = Form(...)
 ):
-    if patient_collection.find_one({"email": email}):
+    if await patient_collection.find_one({"email": email}):
         return templates.TemplateResponse("patient/register.html",
                                           {"request": request, "error": "Email already registered"})
 
-    patient_collection.insert_one({
+    await patient_collection.insert_one({
         "full_name": full_name,
         "email": email,
         "phone_number": phone_number,
-        "password": bcrypt.hash(password),
+        "password": await hash_password(password),
         "age": age,
         "gender": gender,
         "address": address
@@ -269,9 +357,12 @@ async def post_patient_login(
         email: str = Form(...),
         password: str = Form(...)
 ):
-    user = patient_collection.find_one({"email": email})
-    if not user or not bcrypt.verify(password, user["password"]):
+    user = await patient_collection.find_one({"email": email})
+    valid, new_hash = await verify_password(password, user["password"]) if user else (False, None)
+    if not valid:
         return templates.TemplateResponse("patient/login.html", {"request": request, "error": "Invalid credentials"})
+    if new_hash:
+        await patient_collection.update_one({"_id": user["_id"]}, {"$set": {"password": new_hash}})
 
     request.session["user"] = str(user["_id"])
     request.session["role"] = "patient"
@@ -294,37 +385,35 @@ async def patient_dashboard(
     action: str = None,
     date: str = None,
     slot: str = None,
+    window: str = Query("upcoming"),
+    after: str = Query(None),
     ok: bool = Depends(require_login)
 ):
     patient_id = request.session.get("user")
     if not patient_id:
         return RedirectResponse("/auth", status_code=status.HTTP_302_FOUND)
+    if window not in WINDOWS:
+        window = "upcoming"
 
-    patient = db["Patients"].find_one({"_id": ObjectId(patient_id)})
-
-    appointments = list(db["Appointments"].find({"patient_id": ObjectId(patient_id)}))
-    for appt in appointments:
-        doctor = db["Doctors"].find_one({"_id": appt["doctor_id"]})
-        clinic = db["Clinics"].find_one({"_id": appt["clinic_id"]})
-
-        appt["doctor_name"] = doctor.get("full_name", "Unknown") if doctor else "Unknown"
-        appt["specialization"] = doctor.get("specialization", "N/A") if doctor else "N/A"
-        appt["clinic_name"] = clinic["name"] if clinic else "Unknown"
-        appt["clinic_address"] = clinic["address"] if clinic else "Unknown"
+    # One page, with doctor and clinic details joined server-side in a single round trip
+    appointments, next_cursor = await patient_appointments(ObjectId(patient_id), window, after)
 
     return templates.TemplateResponse("patient/dashboard.html", {
         "request": request,
         "appointments": appointments,
         "action": action,
         "date": date,
-        "slot": slot
+        "slot": slot,
+        "window": window,
+        "after": after,
+        "next_cursor": next_cursor
     })
 
 
 
 @app.get("/doctor/register", response_class=HTMLResponse)
 async def get_doctor_register(request: Request):
-    clinics = list(db["Clinics"].find({}))
+    clinics = await clinic_cache.all()
     return templates.TemplateResponse("doctor/register.html", {
         "request": request,
         "clinics": clinics
@@ -342,10 +431,11 @@ async def post_doctor_register(
     password: str = Form(...)
 ):
     clinic_obj_id = ObjectId(clinic)
-    doctor = doctor_collection.find_one({"email": email})
+    doctor = await doctor_collection.find_one({"email": email})
+    hashed_password = await hash_password(password)
 
     # Check if doctor already exists based on name + specialization + clinic
-    existing_doctor = doctor_collection.find_one({
+    existing_doctor = await doctor_collection.find_one({
         "full_name": full_name,
         "specialization": specialization,
         "clinic_id": clinic_obj_id
@@ -353,23 +443,23 @@ async def post_doctor_register(
 
     # in POST /doctor/register
     if existing_doctor:
-        doctor_collection.update_one(
+        await doctor_collection.update_one(
             {"_id": existing_doctor["_id"]},
             {"$set": {
                 "email": email,
-                "password": bcrypt.hash(password),
+                "password": hashed_password,
                 "status": existing_doctor.get("status", "pending"),
                 "is_approved": existing_doctor.get("is_approved", False),
                 "approved_at": existing_doctor.get("approved_at", None),
             }}
         )
     else:
-        doctor_collection.insert_one({
+        await doctor_collection.insert_one({
             "full_name": full_name,
             "email": email,
             "specialization": specialization,
             "clinic_id": clinic_obj_id,
-            "password": bcrypt.hash(password)
+            "password": hashed_password
         })
     status_val = doctor.get("status","pending")
     if status_val != "approved":
@@ -388,13 +478,16 @@ async def get_doctor_login(request: Request):
 
 @app.post("/doctor/login", response_class=HTMLResponse)
 async def post_doctor_login(request: Request, email: str = Form(...), password: str = Form(...)):
-    doctor = doctor_collection.find_one({"email": email})
+    doctor = await doctor_collection.find_one({"email": email})
     if not doctor:
         return templates.TemplateResponse("doctor/login.html", {"request": request, "error": "No such account"})
 
     # If the doctor registered via Google, password is None
-    if doctor.get("password") is None or not bcrypt.verify(password, doctor["password"]):
+    valid, new_hash = (False, None) if doctor.get("password") is None else await verify_password(password, doctor["password"])
+    if not valid:
         return templates.TemplateResponse("doctor/login.html", {"request": request, "error": "Invalid credentials"})
+    if new_hash:
+        await doctor_collection.update_one({"_id": doctor["_id"]}, {"$set": {"password": new_hash}})
     
     
     status_val = doctor.get("status", "pending")
@@ -412,7 +505,7 @@ async def post_doctor_login(request: Request, email: str = Form(...), password:
 
 
 @app.get("/doctor/dashboard", response_class=HTMLResponse)
-async def doctor_dashboard(request: Request):
+async def doctor_dashboard(request: Request, window: str = Query("upcoming"), after: str = Query(None)):
     doctor_id = request.session.get("user")
     role = request.session.get("role")
     if not doctor_id or role != "doctor":
@@ -423,32 +516,39 @@ async def doctor_dashboard(request: Request):
     except:
         return HTMLResponse("Invalid doctor ID", status_code=400)
 
-    appointments = list(db["Appointments"].find({"doctor_id": doctor_obj_id}))
-
-    patient_data = []
-    for appt in appointments:
-        patient = db["Patients"].find_one({"_id": appt["patient_id"]})
-        if not patient:
-            continue
-        patient_data.append({
-            "name": patient.get("full_name", "Unknown"),
-            "email": patient.get("email", "Unknown"),
-            "date": appt["date"],
-            "slot": appt["slot"],
-            "age": patient.get("age", "N/A"),
-            "phone": patient.get("phone_number", "N/A"),
-            "appointment_id": str(appt["_id"])
-        })
-
-    doctor = db["Doctors"].find_one({"_id": doctor_obj_id})
+    # Check approval before touching appointments
+    doctor = await db["Doctors"].find_one({"_id": doctor_obj_id}, {"full_name": 1, "status": 1})
     if not doctor or doctor.get("status") != "approved":
         return RedirectResponse("/doctor/login", status_code=302)
 
+    if window not in WINDOWS:
+        window = "upcoming"
+    patient_data, next_cursor = await doctor_appointments(doctor_obj_id, window, after)
+
     return templates.TemplateResponse("doctor/dashboard.html", {
         "request": request,
         "doctor": doctor,
-        "patients": patient_data
+        "patients": patient_data,
+        "window": window,
+        "after": after,
+        "next_cursor": next_cursor
     })
+
+
+@app.get("/doctor/dashboard/events")
+async def doctor_dashboard_events(request: Request):
+    """Server-Sent Events for the doctor's open dashboard: new, moved and cancelled appointments."""
+    doctor_id = request.session.get("user")
+    if not doctor_id or request.session.get("role") != "doctor":
+        return Response(status_code=401)
+    try:
+        doctor_obj_id = ObjectId(doctor_id)
+    except:
+        return Response(status_code=400)
+    doctor = await db["Doctors"].find_one({"_id": doctor_obj_id}, {"status": 1})
+    if not doctor or doctor.get("status") != "approved":
+        return Response(status_code=403)
+    return sse_response(doctor_topic(doctor_obj_id))
     
 # ----------------- Admin Auth & Dashboard -----------------
 
@@ -493,22 +593,44 @@ async def admin_logout(request: Request):
     return RedirectResponse("/", status_code=302)
 
 @app.get("/admin/dashboard", response_class=HTMLResponse)
-async def admin_dashboard(request: Request):
+async def admin_dashboard(
+    request: Request,
+    status: str = Query("pending"),
+    q: str = Query(None),
+    after: str = Query(None)
+):
     guard = require_admin(request)
     if guard is not True:
         return guard
 
-    pending  = list(doctor_collection.find({"$or": [{"status": "pending"}, {"status": {"$exists": False}}]}))
-    approved = list(doctor_collection.find({"status": "approved"}))
-    denied   = list(doctor_collection.find({"status": "denied"}))
-
-
-    def tbl(title, docs):
-        rows = "".join(f"""
+    if status not in DOCTOR_STATUSES:
+        status = "pending"
+    try:
+        after_id = ObjectId(after) if after else None
+    except Exception:
+        after_id = None
+
+    counts = await doctor_status_counts(q)
+    flash = request.session.pop("admin_flash", None)
+    docs, next_after = await doctor_page(status, q, after_id, limit=ADMIN_PAGE_SIZE)
+
+    def link(**params):
+        params = {"status": status, "q": q, **params}
+        return "/admin/dashboard?" + urlencode({k: v for k, v in params.items() if v})
+
+    tabs = "".join(f"""
+        <li class="nav-item">
+          <a class="nav-link {'active' if s == status else ''}" href="{link(status=s, after=None)}">
+            {s.capitalize()} <span class="badge bg-secondary">{counts[s]}</span>
+          </a>
+        </li>""" for s in DOCTOR_STATUSES)
+
+    rows = "".join(f"""
         <tr>
-          <td>{d.get('full_name','')}</td>
-          <td>{d.get('email','')}</td>
-          <td>{d.get('specialization','')}</td>
+          <td><input type="checkbox" name="doctor_ids" value="{str(d['_id'])}" form="bulk" class="form-check-input"></td>
+          <td>{escape(d.get('full_name') or '')}</td>
+          <td>{escape(d.get('email') or '')}</td>
+          <td>{escape(d.get('specialization') or '')}</td>
           <td>
             <form method="post" action="/admin/doctor/{str(d['_id'])}/approve" class="d-inline">
               <button class="btn btn-sm btn-success">Approve</button>
@@ -518,17 +640,14 @@ async def admin_dashboard(request: Request):
             </form>
           </td>
         </tr>""" for d in docs)
-        if not rows:
-            rows = '<tr><td colspan="4" class="text-center text-muted">None</td></tr>'
-        return f"""
-        <h5 class="mt-4">{title} <span class="badge bg-secondary">{len(docs)}</span></h5>
-        <div class="table-responsive">
-          <table class="table table-sm align-middle">
-            <thead><tr><th>Name</th><th>Email</th><th>Specialization</th><th>Actions</th></tr></thead>
-            <tbody>{rows}</tbody>
-          </table>
-        </div>
-        """
+    if not rows:
+        rows = '<tr><td colspan="5" class="text-center text-muted">None</td></tr>'
+
+    pager = ""
+    if after_id:
+        pager += f'<a class="btn btn-sm btn-outline-secondary" href="{link(after=None)}">&laquo; First page</a>'
+    if next_after:
+        pager += f'<a class="btn btn-sm btn-outline-secondary ms-2" href="{link(after=str(next_after))}">Next &raquo;</a>'
 
     html = f"""
     <!doctype html><html><head>
@@ -536,7 +655,7 @@ async def admin_dashboard(request: Request):
       <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css" rel="stylesheet">
     </head><body class="p-4" style=
     "font-family:Segoe UI";
-    "background-image: url('/static/images/bg.png');
+    "{background_image("images/bg.png", quote="'")}
     background-size: cover;
     background-repeat: no-repeat;
     background-position: center;">
@@ -545,23 +664,62 @@ async def admin_dashboard(request: Request):
           <h3>Admin Dashboard</h3>
           <a class="btn btn-outline-secondary" href="/admin/logout">Logout</a>
         </div>
-        {tbl("Pending Doctors", pending)}
-        {tbl("Approved Doctors", approved)}
-        {tbl("Denied Doctors", denied)}
+        <form method="get" action="/admin/dashboard" class="d-flex mt-3">
+          <input type="hidden" name="status" value="{status}">
+          <input name="q" value="{escape(q or '')}" class="form-control me-2" placeholder="Search name, email or specialization">
+          <button class="btn btn-primary">Search</button>
+        </form>
+        {'<div class="alert alert-info mt-3">' + escape(flash) + '</div>' if flash else ''}
+        <ul class="nav nav-tabs mt-4">{tabs}</ul>
+        <form id="bulk" method="post" action="/admin/doctors/bulk" class="d-flex flex-wrap gap-2 my-2">
+          <input type="hidden" name="status" value="{status}">
+          <input type="hidden" name="q" value="{escape(q or '')}">
+          <button name="action" value="approve" class="btn btn-sm btn-success">Approve selected</button>
+          <button name="action" value="deny" class="btn btn-sm btn-outline-danger">Deny selected</button>
+          <button name="action" value="approve" formaction="/admin/doctors/bulk?all_matching=1" class="btn btn-sm btn-outline-success"
+                  onclick="return confirm('Approve all {counts[status]} {status} doctors matching this search?');">Approve all matching</button>
+          <button name="action" value="deny" formaction="/admin/doctors/bulk?all_matching=1" class="btn btn-sm btn-outline-danger"
+                  onclick="return confirm('Deny all {counts[status]} {status} doctors matching this search?');">Deny all matching</button>
+        </form>
+        <div class="table-responsive">
+          <table class="table table-sm align-middle">
+            <thead><tr>
+              <th><input type="checkbox" class="form-check-input"
+                   onclick="document.querySelectorAll('input[name=doctor_ids]').forEach(c => c.checked = this.checked)"></th>
+              <th>Name</th><th>Email</th><th>Specialization</th><th>Actions</th>
+            </tr></thead>
+            <tbody>{rows}</tbody>
+          </table>
+        </div>
+        <div>{pager}</div>
       </div>
     </body></html>
     """
     return HTMLResponse(html)
 
+@app.get("/admin/metrics")
+async def admin_metrics(request: Request):
+    guard = require_admin(request)
+    if guard is not True:
+        return guard
+    # Each worker answers with its own counters; the pid says which one this was
+    return {
+        "worker_pid": os.getpid(),
+        "cache_versions": cache_sync.stats(),
+        "change_stream_connected": cache_sync.stream_connected,
+        "live_updates": broadcaster.stats(),
+        "search_index": search.doctor_search.stats(),
+        "clinic_cache": clinic_cache.stats(),
+        "page_cache": page_cache.stats(),
+        "password_hashing": passwords.stats()
+    }
+
 @app.post("/admin/doctor/{doctor_id}/approve")
 async def admin_approve_doctor(request: Request, doctor_id: str):
     guard = require_admin(request)
     if guard is not True:
         return guard
-    doctor_collection.update_one(
-        {"_id": ObjectId(doctor_id)},
-        {"$set": {"status": "approved", "is_approved": True, "approved_at": datetime.utcnow()}}
-    )
+    await moderate_doctors([doctor_id], "approve", actor=ADMIN_EMAIL)
     return RedirectResponse("/admin/dashboard", status_code=302)
 
 @app.post("/admin/doctor/{doctor_id}/deny")
@@ -569,12 +727,43 @@ async def admin_deny_doctor(request: Request, doctor_id: str):
     guard = require_admin(request)
     if guard is not True:
         return guard
-    doctor_collection.update_one(
-        {"_id": ObjectId(doctor_id)},
-        {"$set": {"status": "denied", "is_approved": False, "approved_at": None}}
-    )
+    await moderate_doctors([doctor_id], "deny", actor=ADMIN_EMAIL)
     return RedirectResponse("/admin/dashboard", status_code=302)
 
+@app.post("/admin/doctors/bulk")
+async def admin_bulk_moderate(
+    request: Request,
+    action: str = Form(...),
+    doctor_ids: List[str] = Form([]),
+    status: str = Form("pending"),
+    q: str = Form(None),
+    all_matching: bool = Query(False)
+):
+    """Approve/deny the selected doctors, or every doctor matching status + search."""
+    guard = require_admin(request)
+    if guard is not True:
+        return guard
+    if action not in ("approve", "deny"):
+        raise HTTPException(status_code=400, detail="action must be 'approve' or 'deny'")
+
+    if all_matching:
+        if status not in DOCTOR_STATUSES:
+            raise HTTPException(status_code=400, detail="Unknown status")
+        # Applied to the filter directly; there may be too many doctors to list per id
+        summary = await moderate_matching(status, q, action, actor=ADMIN_EMAIL)
+        if "application/json" in request.headers.get("accept", ""):
+            return {"action": action, "counts": summary}
+    else:
+        results = await moderate_doctors(doctor_ids, action, actor=ADMIN_EMAIL)
+        if "application/json" in request.headers.get("accept", ""):
+            return {"action": action, "results": results}
+        summary = Counter(results.values())
+
+    summary = {outcome: n for outcome, n in summary.items() if n}
+    request.session["admin_flash"] = f"{action.capitalize()}: " + ", ".join(
+        f"{n} {outcome.replace('_', ' ')}" for outcome, n in summary.items()) if summary else "No doctors selected."
+    return RedirectResponse(f"/admin/dashboard?{urlencode({'status': status, 'q': q or ''})}", status_code=302)
+
     
 @app.get("/logout")
 async def logout(request: Request):
@@ -584,107 +773,61 @@ async def logout(request: Request):
 
 @app.get("/Cardiology", response_class=HTMLResponse)
 async def cardiology_page(request: Request):
-    user_name = request.session.get("user_name")
-    role = request.session.get("role")
-    return templates.TemplateResponse("cardio.html", {
-        "request": request,
-        "user_name": user_name,
-        "role": role
-    })
+    return page_cache.response(request, "cardio.html")
     
 @app.get("/Dentist", response_class=HTMLResponse)
 async def dentist_page(request: Request):
-    user_name = request.session.get("user_name")
-    role = request.session.get("role")
-    return templates.TemplateResponse("dental.html", {
-        "request": request,
-        "user_name": user_name,
-        "role": role
-    })
+    return page_cache.response(request, "dental.html")
     
 @app.get("/Gynecology", response_class=HTMLResponse)
 async def gynecologist_page(request: Request):
-    user_name = request.session.get("user_name")
-    role = request.session.get("role")
-    return templates.TemplateResponse("gyneaco.html", {
-        "request": request,
-        "user_name": user_name,
-        "role": role
-    })
+    return page_cache.response(request, "gyneaco.html")
     
 @app.get("/Neurology", response_class=HTMLResponse)
 async def gynecologist_page(request: Request):
-    user_name = request.session.get("user_name")
-    role = request.session.get("role")
-    return templates.TemplateResponse("neurology.html", {
-        "request": request,
-        "user_name": user_name,
-        "role": role
-    })
+    return page_cache.response(request, "neurology.html")
     
 @app.get("/Pediatrician", response_class=HTMLResponse)
 async def pediatric_page(request: Request):
-    user_name = request.session.get("user_name")
-    role = request.session.get("role")
-    return templates.TemplateResponse("pediatrics.html", {
-        "request": request,
-        "user_name": user_name,
-        "role": role
-    })
+    return page_cache.response(request, "pediatrics.html")
     
 @app.get("/Psychiatrist", response_class=HTMLResponse)
 async def pediatric_page(request: Request):
-    user_name = request.session.get("user_name")
-    role = request.session.get("role")
-    return templates.TemplateResponse("psychiatry.html", {
-        "request": request,
-        "user_name": user_name,
-        "role": role
-    })
+    return page_cache.response(request, "psychiatry.html")
     
 @app.get("/Orthopedic", response_class=HTMLResponse)
 async def ortho_page(request: Request):
-    user_name = request.session.get("user_name")
-    role = request.session.get("role")
-    return templates.TemplateResponse("ortho.html", {
-        "request": request,
-        "user_name": user_name,
-        "role": role
-    })
+    return page_cache.response(request, "ortho.html")
 
 @app.get("/OurTeam", response_class=HTMLResponse)
 async def our_team_page(request: Request):
-    user_name = request.session.get("user_name")
-    role = request.session.get("role")
-    return templates.TemplateResponse("our_team.html", {
-        "request": request,
-        "user_name": user_name,
-        "role": role
-    })
+    return page_cache.response(request, "our_team.html")
 
 @app.get("/AboutUs", response_class=HTMLResponse)
 async def about_us_page(request: Request):
-    user_name = request.session.get("user_name")
-    role = request.session.get("role")
-    return templates.TemplateResponse("about_us.html", {
-        "request": request,
-        "user_name": user_name,
-        "role": role
-    })
+    return page_cache.response(request, "about_us.html")
 
 @app.get("/Blog", response_class=HTMLResponse)
 async def blog_page(request: Request):
-    user_name = request.session.get("user_name")
-    role = request.session.get("role")
-    return templates.TemplateResponse("blog.html", {
+    return page_cache.response(request, "blog.html")
+
+async def render_nearest(request: Request, query: dict, lat: float, lng: float, radius: float):
+    """Specialty listing around a point: nearest clinics first, one aggregation (see geo.py)."""
+    radius = radius or DEFAULT_RADIUS_KM
+    doctors = await nearest_doctors(query["specialization"], lat, lng, radius, query.get("clinic_id"))
+    return templates.TemplateResponse("specialty/choose_doctor.html", {
         "request": request,
-        "user_name": user_name,
-        "role": role
+        "specialization": query["specialization"],
+        "doctors": doctors,
+        "radius": radius,
+        "nearby": True,
     })
 
+
 # Show doctors by specialization
 @app.get("/specialty/{specialization}", response_class=HTMLResponse)
-async def show_specialty_page(request: Request, specialization: str, clinic_id: str = Query(None)):
+async def show_specialty_page(request: Request, specialization: str, clinic_id: str = Query(None),
+                              lat: float = Query(None), lng: float = Query(None), radius: float = Query(None, gt=0)):
     query = {"specialization": specialization.capitalize()}
 
     if clinic_id:
@@ -693,14 +836,18 @@ async def show_specialty_page(request: Request, specialization: str, clinic_id:
         except:
             pass
 
-    doctors = list(db["Doctors"].find(query))
+    if valid_coordinates(lat, lng):
+        return await render_nearest(request, query, lat, lng, radius)
+
+    doctors = await db["Doctors"].find(query).to_list(None)
+    clinics = await clinic_cache.get_many(doc.get("clinic_id") for doc in doctors)
 
     for doc in doctors:
         clinic_id = doc.get("clinic_id")
         if not clinic_id:
             continue  
 
-        clinic = db["Clinics"].find_one({"_id": clinic_id})
+        clinic = clinics.get(clinic_id)
 
         doc["clinic_name"] = clinic["name"] if clinic else "Unknown"
         doc["clinic_address"] = clinic["address"] if clinic else "N/A"
@@ -712,7 +859,8 @@ async def show_specialty_page(request: Request, specialization: str, clinic_id:
     })
 
 @app.get("/clinics/{specialization}", response_class=HTMLResponse)
-async def show_specialty_page(request: Request, specialization: str, clinic_id: str = Query(None)):
+async def show_specialty_page(request: Request, specialization: str, clinic_id: str = Query(None),
+                              lat: float = Query(None), lng: float = Query(None), radius: float = Query(None, gt=0)):
     query = {"specialization": specialization.capitalize()}
 
     if clinic_id:
@@ -721,7 +869,11 @@ async def show_specialty_page(request: Request, specialization: str, clinic_id:
         except:
             pass
 
-    doctors = db["Doctors"].find(query)
+    if valid_coordinates(lat, lng):
+        return await render_nearest(request, query, lat, lng, radius)
+
+    doctors = await db["Doctors"].find(query).to_list(None)
+    clinics = await clinic_cache.get_many(doc.get("clinic_id") for doc in doctors)
 
     doctor_list = []
     for doc in doctors:
@@ -729,7 +881,7 @@ async def show_specialty_page(request: Request, specialization: str, clinic_id:
         if not clinic_id:
             continue 
 
-        clinic = db["Clinics"].find_one({"_id": clinic_id})
+        clinic = clinics.get(clinic_id)
         if not clinic:
             continue 
 
@@ -751,6 +903,15 @@ async def show_specialty_page(request: Request, specialization: str, clinic_id:
     })
     
     
+def page_availability(availability):
+    """``get_availability`` output for embedding in a page's script (decoded there with ``BigInt``).
+
+    Bitmaps become hex strings: a long day has more slots than a JS number holds exact bits.
+    """
+    return {"slots": availability["slots"],
+            "days": {day: format(bits, "x") for day, bits in availability["days"].items()}}
+
+
 # Booking page for specific doctor
 @app.get("/book/{doctor_id}", response_class=HTMLResponse)
 async def show_booking_page(
@@ -764,25 +925,26 @@ async def show_booking_page(
     if not patient_id:
         return RedirectResponse("/auth", status_code=status.HTTP_302_FOUND)
 
-    doctor = db["Doctors"].find_one({"_id": ObjectId(doctor_id)})
-    clinic = db["Clinics"].find_one({"_id": doctor["clinic_id"]})
-    today = datetime.now().strftime("%Y-%m-%d")
+    doctor = await db["Doctors"].find_one({"_id": ObjectId(doctor_id)})
+    clinic = await clinic_cache.get(doctor["clinic_id"])
+    today = local_today()
 
-    all_slots = [
-        "10:00 AM", "10:30 AM", "11:00 AM", "11:30 AM",
-        "12:00 PM", "12:30 PM", "2:00 PM", "2:30 PM"
-    ]
+    last_day = today + timedelta(days=BOOKING_WINDOW_DAYS - 1)
 
-    booked = db["Appointments"].find({"doctor_id": ObjectId(doctor_id)})
-    booked_slots = [f"{appt['date']}::{appt['slot']}" for appt in booked]
+    # Only the bookable window is read, not the doctor's whole history
+    availability = await get_availability(
+        doctor, today, last_day,
+        exclude_id=ObjectId(edit_id) if edit_id else None, holder=ObjectId(patient_id)
+    )
 
     return templates.TemplateResponse("book/appointment.html", {
         "request": request,
         "doctor": doctor,
         "clinic": clinic,
-        "available_slots": all_slots,
-        "today": today,
-        "booked_slots": booked_slots,
+        "available_slots": availability["slots"],
+        "today": today.isoformat(),
+        "last_day": last_day.isoformat(),
+        "availability": page_availability(availability),
         "edit": bool(edit_id),  # pass True if editing
         "edit_id": edit_id,
         "existing_date": date,
@@ -795,7 +957,8 @@ async def submit_booking(
     doctor_id: str,
     date: str = Form(...),
     slot: str = Form(...),
-    edit_id: str = Form(None)
+    edit_id: str = Form(None),
+    hold_id: str = Form(None)
 ):
     # ✅ Get patient ID from session
     patient_id = request.session.get("user")
@@ -803,7 +966,7 @@ async def submit_booking(
         return RedirectResponse("/", status_code=302)
 
     # ✅ Get doctor
-    doctor = db["Doctors"].find_one({"_id": ObjectId(doctor_id)})
+    doctor = await db["Doctors"].find_one({"_id": ObjectId(doctor_id)})
     if not doctor:
         return HTMLResponse("Doctor not found", status_code=404)
 
@@ -811,23 +974,40 @@ async def submit_booking(
     if not clinic_id:
         return HTMLResponse("Clinic not associated with this doctor", status_code=400)
 
-    # ✅ Check for slot conflict
-    query = {
-        "doctor_id": ObjectId(doctor_id),
-        "date": date,
-        "slot": slot
-    }
+    if slot not in doctor_slots(doctor):
+        return HTMLResponse("Invalid slot for this doctor", status_code=400)
 
-    if edit_id:
-        query["_id"] = {"$ne": ObjectId(edit_id)}
+    start_at = slot_start(date, slot)
+    if start_at is None or start_at < utcnow():
+        return HTMLResponse("This slot is in the past", status_code=400)
 
-    existing = db["Appointments"].find_one(query)
-    if existing:
-        return HTMLResponse(content="""
+    # ✅ The unique slot index rejects conflicts on every path below
+    booked_id = None
+    if edit_id:
+        # Reschedule in place with a single write
+        outcome = await reschedule_appointment(
+            ObjectId(edit_id), date, slot,
+            match={"patient_id": ObjectId(patient_id), "doctor_id": ObjectId(doctor_id)},
+            duration_minutes=slot_minutes(doctor)
+        )
+        if outcome == "not_found":
+            return HTMLResponse("Appointment not found", status_code=404)
+        booked_id = outcome == "moved"
+    else:
+        # Confirm the hold taken when the slot was picked, else book directly
+        if hold_id and ObjectId.is_valid(hold_id):
+            if await confirm_hold(ObjectId(hold_id), doctor["_id"], ObjectId(patient_id), date, slot):
+                booked_id = ObjectId(hold_id)
+        if not booked_id:
+            booked_id = await book_slot(ObjectId(doctor_id), clinic_id, ObjectId(patient_id), date, slot,
+                                        duration_minutes=slot_minutes(doctor))
+
+    if not booked_id:
+        return HTMLResponse(content=f"""
             <body style="
                 margin: 0;
                 padding: 0;
-                background-image: url('/static/images/bg.png');
+                {background_image("images/bg.png", quote="'")}
                 background-size: cover;
                 background-repeat: no-repeat;
                 background-position: center;
@@ -862,18 +1042,6 @@ async def submit_booking(
             </div>
         """, status_code=409)
 
-    # ✅ Create appointment
-    db["Appointments"].insert_one({
-        "doctor_id": ObjectId(doctor_id),
-        "clinic_id": clinic_id,
-        "patient_id": ObjectId(patient_id),
-        "slot": slot,
-        "date": date
-    })
-
-    if edit_id:
-        db["Appointments"].delete_one({"_id": ObjectId(edit_id)})
-
     action = "updated" if edit_id else "booked"
     return RedirectResponse(
         f"/patient/dashboard?action={action}&date={date}&slot={slot}",
@@ -882,10 +1050,112 @@ async def submit_booking(
 
 
 
+@app.get("/api/search")
+async def search_doctors(q: str = Query("", max_length=100), limit: int = Query(10, ge=1, le=50)):
+    """Typeahead over approved doctors by name, specialization and clinic name/address.
+
+    Served from the worker's in-memory index; prefix matches per word, with
+    one-typo tolerance when a word matches nothing.
+    """
+    if not search.doctor_search.ready:
+        return JSONResponse({"query": q, "results": [], "detail": "Search index is loading"}, status_code=503)
+    results = search.doctor_search.search(q, limit)
+    for result in results:
+        result["book_url"] = f"/book/{result['id']}"
+    return {"query": q, "results": results}
+
+
+@app.get("/api/doctors/{doctor_id}/availability")
+async def doctor_availability_api(
+    request: Request,
+    doctor_id: str,
+    from_date: str = Query(None, alias="from"),
+    to_date: str = Query(None, alias="to")
+):
+    try:
+        doctor = await db["Doctors"].find_one(
+            {"_id": ObjectId(doctor_id)},
+            {"opening_hours": 1, "closing_hours": 1, "slot_minutes": 1, "schedule_version": 1, "holds_until": 1}
+        )
+    except Exception:
+        doctor = None
+    if not doctor:
+        raise HTTPException(status_code=404, detail="Doctor not found")
+
+    try:
+        start = datetime.strptime(from_date, "%Y-%m-%d").date() if from_date else local_today()
+        end = datetime.strptime(to_date, "%Y-%m-%d").date() if to_date else start + timedelta(days=BOOKING_WINDOW_DAYS - 1)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be YYYY-MM-DD")
+    if end < start:
+        raise HTTPException(status_code=400, detail="'to' must not be before 'from'")
+
+    # Strong ETag: changes whenever the doctor's appointments or working hours change.
+    # (CompressionMiddleware suffixes it per encoding, and strips the suffix from If-None-Match.)
+    # Holds lapse without a write, so while any may be live the ETag also rolls every minute.
+    holds_live = doctor.get("holds_until") and doctor["holds_until"] > utcnow()
+    hold_epoch = int(time.time() // 60) if holds_live else 0
+    # A signed-in patient's own holds show as free, so the response (and tag) is per patient
+    patient_id = request.session.get("user") if request.session.get("role") == "patient" else None
+    holder = ObjectId(patient_id) if patient_id else None
+    key = f"{doctor_id}:{doctor.get('schedule_version', 0)}:{hold_epoch}:{holder}:{start}:{end}:{doctor_slots(doctor)}"
+    etag = '"' + hashlib.sha256(key.encode()).hexdigest()[:32] + '"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+
+    availability = await get_availability(doctor, start, end, holder=holder)
+    return JSONResponse({
+        "doctor_id": doctor_id,
+        "slots": availability["slots"],
+        "free": {day: free_slots(availability, day) for day in availability["days"]}
+    }, headers=headers)
+
+
+@app.post("/api/doctors/{doctor_id}/holds")
+async def create_slot_hold(request: Request, doctor_id: str, date: str = Form(...), slot: str = Form(...)):
+    """Hold a slot for the signed-in patient while they finish booking; 409 if it's taken."""
+    patient_id = request.session.get("user")
+    if not patient_id or request.session.get("role") != "patient":
+        raise HTTPException(status_code=401, detail="Sign in as a patient to hold a slot")
+    if not ObjectId.is_valid(doctor_id):
+        raise HTTPException(status_code=404, detail="Doctor not found")
+    doctor = await db["Doctors"].find_one(
+        {"_id": ObjectId(doctor_id)}, {"clinic_id": 1, "opening_hours": 1, "closing_hours": 1, "slot_minutes": 1}
+    )
+    if not doctor:
+        raise HTTPException(status_code=404, detail="Doctor not found")
+    if slot not in doctor_slots(doctor):
+        raise HTTPException(status_code=400, detail="Invalid slot for this doctor")
+    start_at = slot_start(date, slot)
+    if start_at is None or start_at < utcnow():
+        raise HTTPException(status_code=400, detail="This slot is in the past")
+
+    hold = await hold_slot(doctor["_id"], doctor.get("clinic_id"), ObjectId(patient_id), date, slot,
+                           duration_minutes=slot_minutes(doctor))
+    if not hold:
+        return JSONResponse({"detail": "Slot already taken"}, status_code=409)
+    hold_id, expires_at = hold
+    return JSONResponse({"hold_id": str(hold_id), "expires_at": expires_at.isoformat() + "Z"}, status_code=201)
+
+
+@app.get("/api/doctors/{doctor_id}/slots/events")
+async def doctor_slot_events(doctor_id: str, date: str = Query(...)):
+    """Server-Sent Events for one doctor and date: ``slot`` events as slots are taken or freed."""
+    try:
+        ObjectId(doctor_id)
+        datetime.strptime(date, "%Y-%m-%d")
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid doctor ID or date")
+    return sse_response(slots_topic(doctor_id, date))
+
+
 @app.get("/confirmation", response_class=HTMLResponse)
 async def appointment_confirmation(request: Request, slot: str, date: str, doctor_id: str):
-    doctor = db["Doctors"].find_one({"_id": ObjectId(doctor_id)})
-    clinic = db["Clinics"].find_one({"_id": doctor["clinic_id"]})
+    doctor = await db["Doctors"].find_one({"_id": ObjectId(doctor_id)})
+    clinic = await clinic_cache.get(doctor["clinic_id"])
 
     return templates.TemplateResponse("confirmation.html", {
         "request": request,
@@ -897,28 +1167,31 @@ async def appointment_confirmation(request: Request, slot: str, date: str, docto
 
 @app.get("/appointment/edit/{appointment_id}", response_class=HTMLResponse)
 async def edit_appointment(request: Request, appointment_id: str):
-    appointment = db["Appointments"].find_one({"_id": ObjectId(appointment_id)})
+    appointment = await db["Appointments"].find_one({"_id": ObjectId(appointment_id)})
     if not appointment:
         return HTMLResponse("Appointment not found", status_code=404)
 
-    doctor = db["Doctors"].find_one({"_id": appointment["doctor_id"]})
-    patient = db["Patients"].find_one({"_id": appointment["patient_id"]})
-    today = datetime.now().strftime("%Y-%m-%d")
+    doctor = await db["Doctors"].find_one({"_id": appointment["doctor_id"]})
+    patient = await db["Patients"].find_one({"_id": appointment["patient_id"]})
+    today = local_today()
+    last_day = today + timedelta(days=BOOKING_WINDOW_DAYS - 1)
 
     is_doctor = request.session.get("role") == "doctor"
     template_name = "doctor_edit_appointment.html" if is_doctor else "appointment.html"
 
+    # Same engine as the booking page; the appointment being moved doesn't block its own slot
+    availability = await get_availability(doctor, today, last_day, exclude_id=appointment["_id"]) if doctor else None
+
     return templates.TemplateResponse(template_name, {
         "request": request,
         "doctor": doctor,
         "patient": patient,
         "date": appointment["date"],
         "slot": appointment["slot"],
-        "available_slots": [
-            "10:00 AM", "10:30 AM", "11:00 AM", "11:30 AM",
-            "12:00 PM", "12:30 PM", "2:00 PM", "2:30 PM"
-        ],
-        "today": today,
+        "available_slots": availability["slots"] if availability else [],
+        "availability": page_availability(availability) if availability else {"slots": [], "days": {}},
+        "today": today.isoformat(),
+        "last_day": last_day.isoformat(),
         "edit": True,
         "appointment_id": appointment_id
     })
@@ -932,32 +1205,46 @@ async def update_appointment(
     date: str = Form(...),
     slot: str = Form(...)
 ):
-    # Fetch original appointment
-    appointment = db["Appointments"].find_one({"_id": ObjectId(appointment_id)})
-    if not appointment:
+    role = request.session.get("role")
+    user_id = request.session.get("user")
+    if not user_id or role not in ("doctor", "patient"):
+        return RedirectResponse("/auth", status_code=302)
+    try:
+        appointment_oid = ObjectId(appointment_id)
+    except:
         return HTMLResponse("Appointment not found", status_code=404)
 
-    doctor_id = appointment["doctor_id"]
-
-    # Prevent slot conflicts (exclude this appointment ID)
-    conflict = db["Appointments"].find_one({
-        "doctor_id": doctor_id,
-        "date": date,
-        "slot": slot,
-        "_id": {"$ne": ObjectId(appointment_id)}  # Exclude current one
-    })
+    # Patients move their own appointments, doctors the ones booked with them
+    match = {"doctor_id": ObjectId(user_id)} if role == "doctor" else {"patient_id": ObjectId(user_id)}
+    appointment = await db["Appointments"].find_one({"_id": appointment_oid, **match}, {"doctor_id": 1})
+    if not appointment:
+        return HTMLResponse("Appointment not found", status_code=404)
 
-    if conflict:
+    doctor = await db["Doctors"].find_one(
+        {"_id": appointment["doctor_id"]}, {"opening_hours": 1, "closing_hours": 1, "slot_minutes": 1}
+    )
+    if not doctor or slot not in doctor_slots(doctor):
+        return HTMLResponse("Invalid slot for this doctor", status_code=400)
+
+    start_at = slot_start(date, slot)
+    if start_at is None or start_at < utcnow():
+        return HTMLResponse("Choose a valid future date and slot", status_code=400)
+
+    # Single write - the unique slot index rejects it if another appointment holds this slot;
+    # ``match`` re-checks ownership in the same write
+    outcome = await reschedule_appointment(appointment_oid, date, slot, match=match,
+                                           duration_minutes=slot_minutes(doctor))
+    if outcome == "taken":
         # Styled "Slot Already Booked" error page with bg.png
         return HTMLResponse(
-            content="""
+            content=f"""
             <!DOCTYPE html>
             <html>
             <head><title>Slot Already Booked</title></head>
             <body style='
                 margin: 0;
                 padding: 0;
-                background-image: url("/static/images/bg.png");
+                {background_image('images/bg.png')}
                 background-size: cover;
                 background-position: center;
                 height: 100vh;
@@ -992,13 +1279,8 @@ async def update_appointment(
             status_code=409
         )
 
-    # If no conflict, proceed with update
-    db["Appointments"].update_one(
-        {"_id": ObjectId(appointment_id)},
-        {"$set": {"date": date, "slot": slot}}
-    )
-
-    role = request.session.get("role")
+    if outcome == "not_found":
+        return HTMLResponse("Appointment not found", status_code=404)
 
     if role == "doctor":
         return RedirectResponse("/doctor/dashboard", status_code=302)
@@ -1014,7 +1296,7 @@ async def delete_appointment(request: Request, appointment_id: str):
     if not user_id or not role:
         return RedirectResponse("/auth", status_code=302)
 
-    appointment = db["Appointments"].find_one({"_id": ObjectId(appointment_id)})
+    appointment = await db["Appointments"].find_one({"_id": ObjectId(appointment_id)})
     if not appointment:
         return HTMLResponse("Appointment not found", status_code=404)
 
@@ -1026,7 +1308,8 @@ async def delete_appointment(request: Request, appointment_id: str):
     if role == "doctor" and str(appointment["doctor_id"]) != user_id:
         return HTMLResponse("Unauthorized", status_code=403)
 
-    db["Appointments"].delete_one({"_id": ObjectId(appointment_id)})
+    await db["Appointments"].delete_one({"_id": ObjectId(appointment_id)})
+    await touch_schedule(appointment["doctor_id"])
 
     # Redirect to appropriate dashboard
     if role == "doctor":
@@ -0,0 +1,264 @@
+"""Versioned schema migrations.
+
+Each migration runs exactly once: applied ones are recorded in the
+``_migrations`` collection, and a lock document there keeps concurrent
+runners (e.g. several instances starting together) from racing.
+
+    python migrations.py migrate      # apply pending migrations, then ensure indexes
+    python migrations.py status       # list applied / pending migrations
+
+Workers don't run any of this on startup unless RUN_MIGRATIONS_ON_STARTUP is set.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import time
+from datetime import timedelta
+from pymongo import ReplaceOne, UpdateOne
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from availability import slot_start, utcnow, DEFAULT_SLOT_MINUTES
+from database import db, appointment_collection, doctor_collection
+from indexes import ensure_indexes
+
+migrations_collection = db["_migrations"]
+# Bookings moved out of Appointments by 0004 so the unique slot index can build
+duplicates_collection = db["_duplicate_bookings"]
+# Progress checkpoints for resumable backfills, keyed by migration name
+progress_collection = db["_migration_progress"]
+
+NAMESPACE_NOT_FOUND = 26
+# collMod rejecting changeStreamPreAndPostImages as an unknown option/field on pre-6.0 servers
+PRE_IMAGES_UNSUPPORTED = (72, 40415)
+
+LOCK_ID = "__lock__"
+LOCK_TTL = timedelta(minutes=30)
+# Owner of the lock this process holds while run_migrations() is running
+_lock_owner = None
+
+
+class LockLost(Exception):
+    """Our lock expired and another runner took it; stop rather than run the same migration twice."""
+
+
+async def keep_lock():
+    """Push the lock's expiry out again; long migrations call this once per batch."""
+    if _lock_owner is not None and not await _acquire_lock(_lock_owner):
+        raise LockLost(f"migration lock lost by {_lock_owner}")
+
+
+async def doctor_status_defaults():
+    """Doctors created before moderation existed start out pending."""
+    await doctor_collection.update_many(
+        {"status": {"$exists": False}},
+        {"$set": {"status": "pending", "is_approved": False, "approved_at": None}}
+    )
+
+
+async def backfill_appointment_start_at(batch_size: int = 1000):
+    """Add ``start_at``/``duration_minutes`` to appointments that only have ``date``/``slot`` strings.
+
+    Works through the collection in ``_id`` order, ``batch_size`` documents per
+    ``bulk_write``, checkpointing the last ``_id`` after every batch so an
+    interrupted run resumes where it stopped. Unparseable documents are skipped
+    and counted.
+    """
+    name = "appointments_start_at"
+    checkpoint = await progress_collection.find_one({"_id": name}) or {}
+    last_id = checkpoint.get("last_id")
+    updated = skipped = 0
+
+    while True:
+        query = {"start_at": {"$exists": False}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = await appointment_collection.find(
+            query, {"date": 1, "slot": 1}
+        ).sort("_id", 1).limit(batch_size).to_list(None)
+        if not batch:
+            break
+
+        ops = []
+        for appt in batch:
+            start_at = slot_start(appt.get("date"), appt.get("slot"))
+            if start_at is None:
+                skipped += 1
+                continue
+            ops.append(UpdateOne(
+                {"_id": appt["_id"], "start_at": {"$exists": False}},
+                {"$set": {"start_at": start_at, "duration_minutes": DEFAULT_SLOT_MINUTES}}
+            ))
+        if ops:
+            result = await appointment_collection.bulk_write(ops, ordered=False)
+            updated += result.modified_count
+
+        last_id = batch[-1]["_id"]
+        await keep_lock()
+        await progress_collection.update_one(
+            {"_id": name},
+            {"$set": {"last_id": last_id}, "$inc": {"updated": len(ops), "skipped": len(batch) - len(ops)}},
+            upsert=True
+        )
+        print(f"  {name}: {updated} updated, {skipped} skipped (through {last_id})")
+
+    await progress_collection.update_one({"_id": name}, {"$set": {"done": True}}, upsert=True)
+    return updated, skipped
+
+
+async def appointment_pre_images():
+    """Record pre-images so change-stream delete events still say which doctor they belonged to.
+
+    Needs MongoDB 6.0+; on older servers deletes are broadcast to every open dashboard instead.
+    Any other failure fails the migration, so it isn't recorded as applied.
+    """
+    try:
+        await db.command("collMod", "Appointments", changeStreamPreAndPostImages={"enabled": True})
+    except OperationFailure as exc:
+        if exc.code == NAMESPACE_NOT_FOUND:
+            # Fresh database: migrations run before ensure_indexes, so nothing has created it yet
+            await db.create_collection("Appointments", changeStreamPreAndPostImages={"enabled": True})
+        elif exc.code in PRE_IMAGES_UNSUPPORTED:
+            print(f"  pre-images not enabled (server older than 6.0): {exc}")
+        else:
+            raise
+
+
+async def resolve_duplicate_bookings():
+    """Keep the earliest booking of each doctor/date/slot and move the rest to ``_duplicate_bookings``.
+
+    Double-bookings left over from before slots were reserved atomically block
+    ``doctor_date_slot_unique``. Nothing is deleted outright: the extra copies
+    stay in ``_duplicate_bookings`` for staff to follow up with the patients.
+    """
+    cursor = await appointment_collection.aggregate([
+        {"$group": {"_id": {"doctor_id": "$doctor_id", "date": "$date", "slot": "$slot"},
+                    "ids": {"$push": "$_id"}}},
+        {"$match": {"ids.1": {"$exists": True}}},
+    ], allowDiskUse=True)
+    moved = 0
+    async for group in cursor:
+        extra = sorted(group["ids"])[1:]
+        docs = await appointment_collection.find({"_id": {"$in": extra}}).to_list(None)
+        if not docs:
+            continue
+        # Upserts, so a rerun after an interruption doesn't trip over already-copied documents
+        await duplicates_collection.bulk_write([ReplaceOne({"_id": d["_id"]}, d, upsert=True) for d in docs])
+        await appointment_collection.delete_many({"_id": {"$in": [d["_id"] for d in docs]}})
+        moved += len(docs)
+        if moved % 100 < len(docs):
+            await keep_lock()
+    print(f"  {moved} duplicate booking(s) moved to {duplicates_collection.name}")
+
+
+# Append only - never rename or reorder an entry once it has shipped
+MIGRATIONS = [
+    ("0001_doctor_status_defaults", doctor_status_defaults),
+    ("0002_appointments_start_at", backfill_appointment_start_at),
+    ("0003_appointment_pre_images", appointment_pre_images),
+    ("0004_resolve_duplicate_bookings", resolve_duplicate_bookings),
+    # 0003 again: on a fresh database it used to record itself as applied without enabling anything
+    ("0005_appointment_pre_images_retry", appointment_pre_images),
+]
+
+
+async def _acquire_lock(owner: str) -> bool:
+    now = utcnow()
+    try:
+        await migrations_collection.update_one(
+            {"_id": LOCK_ID, "$or": [{"expires_at": {"$lt": now}}, {"owner": owner}]},
+            {"$set": {"owner": owner, "expires_at": now + LOCK_TTL}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # Someone else holds an unexpired lock, so the upsert tried to insert a second one
+        return False
+    return True
+
+
+async def _release_lock(owner: str):
+    await migrations_collection.delete_one({"_id": LOCK_ID, "owner": owner})
+
+
+async def applied_migrations():
+    return {
+        doc["_id"]: doc
+        async for doc in migrations_collection.find({"applied_at": {"$exists": True}})
+    }
+
+
+async def run_migrations():
+    """Apply pending migrations in order under the lock; returns the names applied.
+
+    Returns None if another runner holds the lock, or takes it over mid-run
+    because ours expired (the lock is refreshed before each migration and per
+    backfill batch, so that means a batch outlasted ``LOCK_TTL``).
+    """
+    global _lock_owner
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    if not await _acquire_lock(owner):
+        print("Another process is running migrations; skipping.")
+        return None
+
+    _lock_owner = owner
+    ran = []
+    try:
+        applied = await applied_migrations()
+        for name, migration in MIGRATIONS:
+            if name in applied:
+                continue
+            await keep_lock()
+            start = time.perf_counter()
+            print(f"Applying {name} ...")
+            await migration()
+            elapsed = time.perf_counter() - start
+            await keep_lock()
+            try:
+                await migrations_collection.insert_one({"_id": name, "applied_at": utcnow(), "duration_seconds": elapsed})
+            except DuplicateKeyError:
+                # Only possible if the lock lapsed between our last refresh and here
+                print(f"{name} was already recorded by another runner")
+            print(f"Applied {name} in {elapsed:.2f}s")
+            ran.append(name)
+    except LockLost as exc:
+        print(f"{exc}; another process has taken over the remaining migrations.")
+        return None
+    finally:
+        _lock_owner = None
+        await _release_lock(owner)
+    return ran
+
+
+async def migrate():
+    """Migrations first, so data that would block an index (e.g. duplicate bookings) is fixed before it's built.
+
+    Raises if a unique index still can't be built, so ``migrate`` exits non-zero
+    and the deploy stops before the app starts serving.
+    """
+    start = time.perf_counter()
+    ran = await run_migrations()
+    if ran is not None:
+        print(f"{len(ran)} migration(s) applied in {time.perf_counter() - start:.2f}s")
+    await ensure_indexes()
+    print(f"Indexes ensured; total {time.perf_counter() - start:.2f}s")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Run schema migrations.")
+    parser.add_argument("command", choices=["migrate", "status"])
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        await migrate()
+        return
+
+    applied = await applied_migrations()
+    for name, _ in MIGRATIONS:
+        doc = applied.get(name)
+        if doc:
+            print(f"applied  {name}  {doc['applied_at']:%Y-%m-%d %H:%M}  ({doc.get('duration_seconds', 0):.2f}s)")
+        else:
+            print(f"pending  {name}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,76 @@
+from collections import OrderedDict
+from fastapi.responses import HTMLResponse
+from markupsafe import escape
+
+# Rendered in place of the user's name, then swapped for the real (escaped) one
+USER_NAME_PLACEHOLDER = "__PAGE_CACHE_USER_NAME__"
+
+
+class PageCache:
+    """LRU cache of rendered marketing pages whose only context is ``user_name``/``role``.
+
+    Each template is rendered once per header variant (anonymous, patient,
+    doctor, other signed-in user) with a placeholder name; a hit only costs a
+    string replace. Entries are dropped when Jinja reports the template file
+    changed. Templates served this way must not use ``request``.
+    """
+
+    def __init__(self, templates, max_size: int = 64):
+        self.templates = templates
+        self.max_size = max_size
+        self._entries = OrderedDict()   # (template_name, variant) -> (template, html)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def variant(user_name, role):
+        if not user_name:
+            return "anonymous"
+        return role if role in ("patient", "doctor") else "user"
+
+    def render(self, template_name: str, user_name=None, role=None) -> str:
+        key = (template_name, self.variant(user_name, role))
+        entry = self._entries.get(key)
+        if entry and entry[0].is_up_to_date:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            html = entry[1]
+        else:
+            self.misses += 1
+            template = self.templates.get_template(template_name)
+            html = template.render({
+                "user_name": USER_NAME_PLACEHOLDER if user_name else None,
+                "role": key[1] if key[1] in ("patient", "doctor") else None,
+            })
+            self._entries[key] = (template, html)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+        if user_name:
+            html = html.replace(USER_NAME_PLACEHOLDER, str(escape(user_name)))
+        return html
+
+    def response(self, request, template_name: str) -> HTMLResponse:
+        return HTMLResponse(self.render(
+            template_name,
+            user_name=request.session.get("user_name"),
+            role=request.session.get("role"),
+        ))
+
+    def invalidate(self, template_name=None):
+        if template_name is None:
+            self._entries.clear()
+            return
+        for key in [k for k in self._entries if k[0] == template_name]:
+            del self._entries[key]
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else None,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+        }
@@ -0,0 +1,310 @@
+"""Typeahead search over approved doctors.
+
+Each worker keeps an in-memory prefix index: every distinct token of a
+doctor's name, specialization and clinic name/address, in a sorted list with
+a posting set per token. A query word matches every indexed token it prefixes
+(one ``bisect`` for the range); a word with no prefix matches falls back to
+tokens one edit away, found through a deletion index. Posting sets hold
+``(lowercased name, doctor_id)`` keys, so intersections and the alphabetical
+ordering of results both run as C set/heap operations.
+
+The index is loaded once at startup and then kept current by ``change_feed``
+(``upsert_doctor`` / ``remove_doctor`` / ``refresh_clinic``). Without a change
+stream it is rebuilt every ``SEARCH_REFRESH_SECONDS``.
+"""
+import asyncio
+import heapq
+import logging
+import os
+import re
+import time
+from bisect import bisect_left, insort
+from itertools import islice
+from bson import ObjectId
+import cache_sync
+from clinic_cache import clinic_cache
+from database import clinic_collection, doctor_collection
+
+logger = logging.getLogger(__name__)
+
+SEARCH_REFRESH_SECONDS = float(os.getenv("SEARCH_REFRESH_SECONDS", "300"))
+DOCTOR_FIELDS = {"full_name": 1, "specialization": 1, "clinic_id": 1, "status": 1}
+# Changes to any other doctor field (e.g. schedule_version) don't touch the index
+INDEXED_FIELDS = set(DOCTOR_FIELDS)
+FUZZY_MIN_LENGTH = 4
+# A query word matching more doctors than this is answered by merging sorted
+# posting lists lazily instead of building and intersecting sets
+BROAD_MATCHES = int(os.getenv("SEARCH_BROAD_MATCHES", "20000"))
+
+_TOKEN = re.compile(r"[^\W_]+")
+
+
+def tokenize(text) -> list:
+    return _TOKEN.findall(str(text or "").lower())
+
+
+def _deletions(token: str):
+    return {token[:i] + token[i + 1:] for i in range(len(token))}
+
+
+def _discard(index: dict, token, key):
+    keys = index.get(token)
+    if keys is not None:
+        keys.discard(key)
+        if not keys:
+            del index[token]
+
+
+def _unsort(index: dict, token, key):
+    keys = index.get(token)
+    if keys is None:
+        return
+    i = bisect_left(keys, key)
+    if i < len(keys) and keys[i] == key:
+        del keys[i]
+    if not keys:
+        del index[token]
+
+
+class DoctorSearch:
+    def __init__(self):
+        self._entries = {}         # doctor_id -> result dict (plus private "_" keys)
+        self._postings = {}        # token -> set of doctor keys
+        self._name_postings = {}   # name token -> set of doctor keys, to rank name matches first
+        self._sorted = {}          # token -> the same keys as a sorted list, for broad words
+        self._name_sorted = {}     # name token -> sorted list of doctor keys
+        self._tokens = []          # sorted keys of _postings
+        self._deletes = {}         # token with one letter removed -> set of tokens
+        self._by_clinic = {}       # clinic_id -> set of doctor_ids
+        self.ready = False
+        self.loaded_at = None
+
+    # -- building -----------------------------------------------------------
+
+    def _add_token(self, token, key):
+        postings = self._postings.get(token)
+        if postings is None:
+            postings = self._postings[token] = set()
+            if self.ready:  # while building, _tokens is sorted once at the end instead
+                self._tokens.insert(bisect_left(self._tokens, token), token)
+            if len(token) >= FUZZY_MIN_LENGTH:
+                for variant in _deletions(token):
+                    self._deletes.setdefault(variant, set()).add(token)
+        postings.add(key)
+        self._add_sorted(self._sorted, token, key)
+
+    def _add_sorted(self, index, token, key):
+        keys = index.setdefault(token, [])
+        if self.ready:
+            insort(keys, key)
+        else:
+            keys.append(key)  # sorted once in replace_with
+
+    def _drop_token(self, token, key):
+        _discard(self._postings, token, key)
+        _unsort(self._sorted, token, key)
+        if token in self._postings:
+            return
+        if self.ready:
+            del self._tokens[bisect_left(self._tokens, token)]
+        if len(token) >= FUZZY_MIN_LENGTH:
+            for variant in _deletions(token):
+                _discard(self._deletes, variant, token)
+
+    def add(self, doctor, clinic=None):
+        """Index (or re-index) one doctor; ``clinic`` supplies the clinic name/address."""
+        doctor_id = str(doctor["_id"])
+        self.remove(doctor_id)
+        clinic = clinic or {}
+        entry = {
+            "id": doctor_id,
+            "name": doctor.get("full_name") or "",
+            "specialization": doctor.get("specialization") or "",
+            "clinic_name": clinic.get("name") or "",
+            "clinic_address": clinic.get("address") or "",
+        }
+        key = (entry["name"].lower(), doctor_id)
+        name_tokens = set(tokenize(entry["name"]))
+        tokens = set(name_tokens)
+        for field in ("specialization", "clinic_name", "clinic_address"):
+            tokens.update(tokenize(entry[field]))
+        entry.update(_key=key, _tokens=tokens, _name_tokens=name_tokens, _clinic_id=doctor.get("clinic_id"))
+
+        self._entries[doctor_id] = entry
+        for token in tokens:
+            self._add_token(token, key)
+        for token in name_tokens:
+            self._name_postings.setdefault(token, set()).add(key)
+            self._add_sorted(self._name_sorted, token, key)
+        if entry["_clinic_id"] is not None:
+            self._by_clinic.setdefault(entry["_clinic_id"], set()).add(doctor_id)
+
+    def remove(self, doctor_id):
+        entry = self._entries.pop(str(doctor_id), None)
+        if entry is None:
+            return
+        for token in entry["_tokens"]:
+            self._drop_token(token, entry["_key"])
+        for token in entry["_name_tokens"]:
+            _discard(self._name_postings, token, entry["_key"])
+            _unsort(self._name_sorted, token, entry["_key"])
+        _discard(self._by_clinic, entry["_clinic_id"], entry["id"])
+
+    def doctors_at(self, clinic_id) -> list:
+        return list(self._by_clinic.get(clinic_id, ()))
+
+    def finish_build(self):
+        """Sort everything appended while building - seconds at 100k doctors, so load() runs it in a thread."""
+        self._tokens = sorted(self._postings)
+        for keys in (*self._sorted.values(), *self._name_sorted.values()):
+            keys.sort()
+
+    def replace_with(self, other: "DoctorSearch"):
+        """Take over a freshly built (and ``finish_build``-ed) index, so a rebuild never serves a half-loaded one."""
+        self._entries, self._postings, self._name_postings = other._entries, other._postings, other._name_postings
+        self._tokens, self._sorted, self._name_sorted = other._tokens, other._sorted, other._name_sorted
+        self._deletes, self._by_clinic = other._deletes, other._by_clinic
+        self.ready, self.loaded_at = True, time.time()
+
+    # -- querying -----------------------------------------------------------
+
+    def _matching_tokens(self, term: str) -> list:
+        """Indexed tokens ``term`` prefixes; failing that, tokens one edit away from it."""
+        start = bisect_left(self._tokens, term)
+        end = bisect_left(self._tokens, term + "\uffff", start)
+        if end > start or len(term) < FUZZY_MIN_LENGTH:
+            return self._tokens[start:end]
+        close = set(self._deletes.get(term, ()))            # term is missing a letter
+        for variant in _deletions(term):
+            if variant in self._postings:                   # term has an extra letter
+                close.add(variant)
+            close.update(self._deletes.get(variant, ()))    # one letter differs
+        return sorted(close)
+
+    def _has_all(self, key, matches) -> bool:
+        tokens = self._entries[key[1]]["_tokens"]
+        return all(not tokens.isdisjoint(allowed) for allowed in matches)
+
+    def _merged(self, index, tokens, matches, exclude=()):
+        """Keys from ``index``'s sorted lists for ``tokens``, in order, that match every term."""
+        last = None
+        for key in heapq.merge(*(index[t] for t in tokens if t in index)):
+            if key != last and key not in exclude and self._has_all(key, matches):
+                yield key
+            last = key
+
+    def search(self, query: str, limit: int = 10) -> list:
+        """Doctors matching every word of ``query``: name matches on the first word first, then A-Z."""
+        terms = tokenize(query)
+        if not terms:
+            return []
+        matches = [self._matching_tokens(term) for term in terms]
+        if not all(matches):
+            return []
+        sizes = [sum(len(self._postings[t]) for t in tokens) for tokens in matches]
+
+        if len(terms) == 1 or min(sizes) > BROAD_MATCHES:
+            # One word, or every word broad (e.g. single letters): walk the first word's lists in
+            # name order and stop at ``limit`` - nearly every doctor walked is a result
+            token_sets = [set(tokens) for tokens in matches]
+            best = list(islice(self._merged(self._name_sorted, matches[0], token_sets), limit))
+            if len(best) < limit:
+                best += islice(self._merged(self._sorted, matches[0], token_sets, set(best)), limit - len(best))
+        else:
+            # Intersect from the most selective word; words far broader than what's left are checked per doctor
+            order = sorted(range(len(matches)), key=sizes.__getitem__)
+            candidates = set().union(*(self._postings[t] for t in matches[order[0]]))
+            for i in order[1:]:
+                if sizes[i] > 4 * len(candidates):
+                    allowed = set(matches[i])
+                    candidates = {k for k in candidates if self._has_all(k, (allowed,))}
+                else:
+                    candidates.intersection_update(set().union(*(self._postings[t] for t in matches[i])))
+            name_postings = [self._name_postings[t] for t in matches[0] if t in self._name_postings]
+            if sum(map(len, name_postings)) <= 4 * len(candidates):
+                name_hits = candidates.intersection(set().union(*name_postings))
+            else:
+                first = set(matches[0])
+                name_hits = {k for k in candidates if not self._entries[k[1]]["_name_tokens"].isdisjoint(first)}
+            best = _smallest(name_hits, limit)
+            if len(best) < limit:
+                best += _smallest(candidates - name_hits, limit - len(best))
+
+        return [
+            {k: v for k, v in self._entries[doctor_id].items() if not k.startswith("_")}
+            for _, doctor_id in best
+        ]
+
+    def stats(self):
+        return {
+            "ready": self.ready,
+            "doctors": len(self._entries),
+            "tokens": len(self._postings),
+            "loaded_at": self.loaded_at,
+        }
+
+
+def _smallest(keys, n) -> list:
+    heap = list(keys)
+    heapq.heapify(heap)
+    return [heapq.heappop(heap) for _ in range(min(n, len(heap)))]
+
+
+doctor_search = DoctorSearch()
+
+
+def _build(doctors, clinics) -> DoctorSearch:
+    index = DoctorSearch()
+    for doctor in doctors:
+        index.add(doctor, clinics.get(doctor.get("clinic_id")))
+    index.finish_build()
+    return index
+
+
+async def load():
+    """(Re)build the index from Mongo: approved doctors plus one pass over their clinics.
+
+    Only the reads and the final swap run on the event loop; tokenizing and
+    sorting are CPU-bound and would stall every request for seconds, so they
+    run in a worker thread on a fresh ``DoctorSearch`` nothing else touches.
+    """
+    start = time.perf_counter()
+    clinics = {c["_id"]: c async for c in clinic_collection.find({}, {"name": 1, "address": 1})}
+    doctors = await doctor_collection.find({"status": "approved"}, DOCTOR_FIELDS).to_list(None)
+    index = await asyncio.to_thread(_build, doctors, clinics)
+    doctor_search.replace_with(index)
+    logger.info("Search index built: %d doctors in %.2fs", len(index._entries), time.perf_counter() - start)
+
+
+async def upsert_doctor(doctor):
+    """Re-index one doctor from its full document (removes it unless approved)."""
+    if doctor.get("status") != "approved":
+        doctor_search.remove(doctor["_id"])
+        return
+    clinic = await clinic_cache.get(doctor["clinic_id"]) if doctor.get("clinic_id") else None
+    doctor_search.add(doctor, clinic)
+
+
+def remove_doctor(doctor_id):
+    doctor_search.remove(doctor_id)
+
+
+async def refresh_clinic(clinic_id):
+    """A clinic's name/address changed: re-index the doctors who work there."""
+    doctor_ids = doctor_search.doctors_at(clinic_id)
+    if not doctor_ids:
+        return
+    clinic = await clinic_collection.find_one({"_id": clinic_id}, {"name": 1, "address": 1})
+    async for doctor in doctor_collection.find({"_id": {"$in": [ObjectId(i) for i in doctor_ids]}}, DOCTOR_FIELDS):
+        doctor_search.add(doctor, clinic)
+
+
+async def run_refresh_loop():
+    """Background task: initial load, then periodic rebuilds while no change stream keeps it current."""
+    while True:
+        try:
+            if not doctor_search.ready or not cache_sync.stream_connected:
+                await load()
+        except Exception as exc:
+            logger.warning("Search index refresh failed: %s", exc)
+        await asyncio.sleep(SEARCH_REFRESH_SECONDS)